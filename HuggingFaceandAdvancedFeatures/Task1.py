@@ -1,6 +1,11 @@
-from transformers import pipeline
+import os
+import sys
 
-sentiment_analyzer = pipeline("sentiment-analysis", model="distilbert-base-uncased-finetuned-sst-2-english")
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from gen_utils.quantize import load_pipeline
+
+# MODEL_PRECISION=int8 runs the int8 dynamically quantized model (cached on disk)
+sentiment_analyzer = load_pipeline("sentiment-analysis", "distilbert-base-uncased-finetuned-sst-2-english")
 
 texts = ["I love this!", "That was awful."]
 results = sentiment_analyzer(texts)
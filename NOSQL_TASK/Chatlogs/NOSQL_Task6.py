@@ -1,6 +1,11 @@
+import os
+import sys
 import streamlit as st
 from datetime import datetime
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from gen_utils.model_host import load_text_generator
+
 #  Firebase Firestore Setup 
 import firebase_admin
 from firebase_admin import credentials, firestore
@@ -11,12 +16,10 @@ if not firebase_admin._apps:
 
 db = firestore.client()
 
-# Transformer Model 
-from transformers import pipeline
-
+# Transformer Model (in this process, or the shared host with MODEL_HOST=socket)
 @st.cache_resource
 def load_model():
-    return pipeline("text-generation", model="gpt2")
+    return load_text_generator("gpt2")
 
 chatbot = load_model()
 
@@ -1,16 +1,25 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from pymongo import MongoClient
 from datetime import datetime
-from transformers import pipeline
 import os
+import sys
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from gen_utils.model_host import get_generator
+from gen_utils.streaming import on_complete, to_sse
+
 app=Flask(__name__)
 
 load_dotenv()
 uri=os.getenv("connection_string")
 
-genrator=pipeline("text-generation",model="gpt2", temperature=0.7, top_k=50, top_p=0.95, num_return_sequences=1)
+# Concurrent requests are gathered into one batched generate
+# (GEN_MAX_BATCH_SIZE / GEN_MAX_WAIT_MS). Loaded at import, so under gunicorn's
+# preload_app the workers share the master's weights; MODEL_HOST=socket sends
+# requests to `python -m gen_utils.model_host` instead
+GEN_KWARGS=dict(do_sample=True, temperature=0.7, top_k=50, top_p=0.95)
+genrator=get_generator("gpt2", **GEN_KWARGS)
 client=MongoClient(uri)
 db=client["SourabhDB"]
 collection=db["generated_results"]
@@ -20,7 +29,11 @@ def user_data():
     data=request.json
     prompt=data.get("prompt")
 
-    output=genrator(prompt,max_length=50)[0]["generated_text"]
+    # None, empty or over-long prompts are rejected before they join a batch
+    try:
+        output=genrator.generate(prompt,max_length=50)
+    except (TypeError,ValueError) as e:
+        return jsonify({"error":str(e)}),400
 
     store_data={
         "Prompt":prompt,
@@ -38,5 +51,34 @@ def user_data():
     })
 
 
+# Same generation as /generate, sent token by token as Server-Sent Events;
+# GET with ?prompt= works with a browser EventSource
+@app.route("/generate/stream",methods=["POST","GET"])
+def user_data_stream():
+    data=request.get_json(silent=True) or request.args
+    prompt=data.get("prompt")
+
+    def save(output):
+        # Runs once the last token has been sent
+        collection.insert_one({
+            "Prompt":prompt,
+            "output":output,
+            "date_time":datetime.now()
+        })
+
+    try:
+        pieces=genrator.stream(prompt, include_prompt=True, max_length=50)
+    except (TypeError,ValueError) as e:
+        return jsonify({"error":str(e)}),400
+    events=to_sse(on_complete(pieces, save), done={"result":"data saved"})
+    return Response(stream_with_context(events), mimetype="text/event-stream",
+                    headers={"Cache-Control":"no-cache","X-Accel-Buffering":"no"})
+
+
+@app.route("/metrics")
+def metrics():
+    return Response(genrator.metrics(),mimetype="text/plain; version=0.0.4")
+
+
 if __name__=="__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -1,15 +1,19 @@
 import streamlit as st
 from pymongo import MongoClient
 from datetime import datetime, timedelta
-from transformers import pipeline
 from dotenv import load_dotenv
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from gen_utils.model_host import load_text_generator
+from gen_utils.streaming import stream_pipeline
 load_dotenv()
 
 # Load GPT-2 Model
 @st.cache_resource
 def load_model():
-    return pipeline("text-generation", model="gpt2", temperature=0.7)
+    return load_text_generator("gpt2", temperature=0.7)
 
 generator = load_model()
 
@@ -34,8 +38,11 @@ prompt = st.text_input("Enter your prompt")
 
 if st.button("Generate"):
     if prompt:
-        output = generator(prompt, max_length=80, num_return_sequences=1)
-        result = output[0]["generated_text"]
+        st.subheader("Generated Result")
+        # Tokens appear as they are generated; the full text is saved at the end
+        result = st.write_stream(stream_pipeline(
+            generator, prompt, include_prompt=True, max_length=80, do_sample=True, temperature=0.7
+        ))
 
         data = {
             "prompt": prompt,
@@ -46,9 +53,6 @@ if st.button("Generate"):
         collection.insert_one(data)
         st.success("Generated & saved to MongoDB")
 
-        st.subheader("Generated Result")
-        st.write(result)
-
 # Today's Entries
 st.subheader("Today's Entries")
 start, end = get_today_range()
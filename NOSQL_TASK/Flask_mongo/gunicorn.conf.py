@@ -0,0 +1,28 @@
+# gunicorn -c gunicorn.conf.py NOSQL_Task3:app
+import gc
+import os
+
+bind = os.getenv("BIND", "127.0.0.1:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+# Handler threads are what feed the micro-batcher inside each worker
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = 120
+
+# Import the app, and so load GPT-2, once in the master. Workers fork from it and share
+# the weights copy-on-write instead of loading N copies. With MODEL_HOST=socket the
+# workers only hold a client, so there is nothing to preload.
+preload_app = os.getenv("MODEL_HOST", "local") == "local"
+
+
+def when_ready(server):
+    # Objects loaded so far stay out of the workers' garbage collections, which would
+    # otherwise write to their headers and un-share the pages holding them
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        import torch
+
+        # N workers each using every core just contend with each other
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
@@ -1,9 +1,13 @@
 import streamlit as st
 from pymongo import MongoClient
 from datetime import datetime
-from transformers import pipeline
 from dotenv import load_dotenv
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from gen_utils.model_host import load_text_generator
+from gen_utils.streaming import stream_pipeline
 
 # ============================================
 # LOAD ENVIRONMENT VARIABLES (CRITICAL!)
@@ -17,7 +21,7 @@ st.markdown('<meta http-equiv="refresh" content="3">', unsafe_allow_html=True)
 # LOAD AI MODEL
 @st.cache_resource
 def load_model():
-    return pipeline("text-generation", model="gpt2", temperature=0.7)
+    return load_text_generator("gpt2", temperature=0.7)
 
 generator = load_model()
 
@@ -80,10 +84,14 @@ with col2:
 
 if generate_btn:
     if prompt.strip():
-        with st.spinner("Generating..."):
+        with st.container(border=True):
             try:
-                output = generator(prompt, max_length=80, num_return_sequences=1)
-                result = output[0]["generated_text"]
+                st.markdown("**Generated Output:**")
+                # Streamed token by token; saved to MongoDB once complete
+                result = st.write_stream(stream_pipeline(
+                    generator, prompt, include_prompt=True, max_length=80,
+                    do_sample=True, temperature=0.7
+                ))
                 
                 # Prepare data
                 data = {
@@ -96,9 +104,6 @@ if generate_btn:
                 insert_result = collection.insert_one(data)
                 st.success(f"Saved to MongoDB! (ID: {str(insert_result.inserted_id)[:8]}...)")
                 
-                # Display result
-                st.info(f"**Generated Output:**\n{result}")
-                
             except Exception as e:
                 st.error(f"Error: {str(e)}")
     else:
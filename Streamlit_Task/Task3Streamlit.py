@@ -1,19 +1,31 @@
+import os
+import sys
+
 import streamlit as st
 import pandas as pd 
-from transformers import pipeline
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from gen_utils.model_host import load_text_generator
+from gen_utils.streaming import stream_pipeline
 
 st.title("Streamlit app that uses Hugging Face to generate text from a prompt")
 @st.cache_resource
 def load_model():
-    return pipeline("text-generation", model ="gpt2", temperature=0.7, top_k=50, top_p=0.95)
+    return load_text_generator("gpt2", temperature=0.7, top_k=50, top_p=0.95)
 text_generator = load_model()
 
 prompt = st.text_area("Enter your prompt here", height=150)
+# Beam search only returns once every beam is finished, so streaming decodes greedily
+stream = st.checkbox("Stream tokens as they are generated", value=True)
 
 if st.button("Generate Text"):
     if prompt.strip() == "":
         st.warning("Please enter a prompt.")
 
+    elif stream:
+        st.subheader("Generated Text")
+        st.write_stream(stream_pipeline(text_generator, prompt, include_prompt=True, max_length=80, do_sample=False))
+
     else:
         with st.spinner("Generating text..."):
             generated = text_generator(prompt, max_length=80,do_sample=False, num_return_sequences=3, num_beams=3, early_stopping=True)
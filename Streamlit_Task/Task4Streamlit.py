@@ -1,17 +1,42 @@
+import os
+import sys
 
 import streamlit as st
-from transformers import pipeline
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rag_utils.conversation import ConversationMemory
+from rag_utils.embedding_cache import load_cached_model
+from gen_utils.model_host import load_text_generator
+from gen_utils.streaming import stream_pipeline
+
+# GPT-2 sees at most 1024 tokens; history gets a fixed share so latency stays flat
+HISTORY_TOKEN_BUDGET = 384
+MAX_NEW_TOKENS = 80
 
 st.title(" Hugging Face Chat App")
 
 @st.cache_resource
 def load_model():
-    return pipeline("text-generation", model="gpt2")
+    return load_text_generator("gpt2")
+
+@st.cache_resource
+def load_embedder():
+    return load_cached_model("all-MiniLM-L6-v2")
 
 generator = load_model()
+embedder = load_embedder()
+
+def count_tokens(text):
+    return len(generator.tokenizer.encode(text))
 
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
+if "memory" not in st.session_state:
+    st.session_state.memory = ConversationMemory(
+        recent_turns=6,
+        token_budget=HISTORY_TOKEN_BUDGET,
+        count_tokens=count_tokens,
+        embed=embedder.encode
+    )
+memory = st.session_state.memory
 
 
 user_input = st.text_area("Enter your prompt:", height=120)
@@ -21,24 +46,28 @@ if st.button("Generate"):
     if user_input.strip() == "":
         st.warning("Please enter a prompt")
     else:
-        with st.spinner("Generating response..."):
-            response = generator(
-                user_input,
-                max_length=120,
-                num_return_sequences=1
-            )[0]["generated_text"]
+        # Recent turns, recalled older turns and the running summary, within budget
+        history = memory.context(embedder.encode(user_input))
+        prompt = f"{history}\nuser: {user_input}\nassistant:" if history else user_input
+        # Without history the reply shows the prompt too, as the pipeline output did
+        response = st.write_stream(stream_pipeline(
+            generator,
+            prompt,
+            include_prompt=not history,
+            max_new_tokens=MAX_NEW_TOKENS,
+            do_sample=True
+        )).strip()
 
-        st.session_state.chat_history.append(
-            {
-                "user": user_input,
-                "bot": response
-            }
-        )
+        memory.add("user", user_input)
+        memory.add("assistant", response)
 
 
 st.subheader("🗨️ Chat History")
 
-for chat in st.session_state.chat_history:
-    st.markdown(f"** You:** {chat['user']}")
-    st.markdown(f"** AI:** {chat['bot']}")
+if memory.archived:
+    st.caption(f"{memory.archived} earlier messages summarised")
+
+for i in range(0, len(memory.recent) - 1, 2):
+    st.markdown(f"** You:** {memory.recent[i]['content']}")
+    st.markdown(f"** AI:** {memory.recent[i + 1]['content']}")
     st.markdown("---")
@@ -1,56 +1,116 @@
 
 import streamlit as st
-from pypdf import PdfReader
-from docx import Document
 import chromadb
-from chromadb.utils import embedding_functions
+import os
+import sys
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rag_utils.embedding_cache import ChromaEmbeddingFunction
+from rag_utils.hybrid import reciprocal_rank_fusion
+from rag_utils.jobs import DEFAULT_JOBS_DIR, JobQueue, JobWorker
+from rag_utils.ingest import chroma_writer, run_pipeline
+from rag_utils.manifest import ChromaManifest, IncrementalIndexer
+from rag_utils.streamlit_app import (
+    iter_file_chunk_items, load_bm25, load_embedder, load_query_cache, load_reranker, show_jobs
+)
+
 load_dotenv()
 
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "2000"))
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "rag_utils")
+# Jobs and their checkpoints survive restarts, so the indexes they checkpoint must too
+CHROMA_PATH = os.getenv("CHROMA_PATH", os.path.join(CACHE_DIR, "chroma"))
+BM25_PATH = os.getenv("BM25_INDEX", os.path.join(CACHE_DIR, "rag_collection.bm25.pkl"))
+TOP_K = 3
+CANDIDATES = 10
+
 # UI 
 st.set_page_config(page_title="RAG Chat App", layout="wide")
 st.title("📄 RAG Chat App (Chat + History)")
 
-# Session State 
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
-
-# Helpers 
-def read_pdf(file):
-    reader = PdfReader(file)
-    return "\n".join([page.extract_text() for page in reader.pages if page.extract_text()])
-
-def read_docx(file):
-    doc = Document(file)
-    return "\n".join([p.text for p in doc.paragraphs])
-
-def read_txt(file):
-    return file.read().decode("utf-8")
-
-def chunk_text(text, chunk_size=500, overlap=50):
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = start + chunk_size
-        chunks.append(text[start:end])
-        start = end - overlap
-    return chunks
-
 # Vector DB 
 @st.cache_resource
 def load_vector_db():
-    client = chromadb.Client()
-    embedder = embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name="all-MiniLM-L6-v2"
-    )
+    client = chromadb.PersistentClient(path=CHROMA_PATH)
     collection = client.get_or_create_collection(
         name="rag_collection",
-        embedding_function=embedder
+        embedding_function=ChromaEmbeddingFunction(load_embedder())
     )
     return collection
 
 collection = load_vector_db()
+embedder = load_embedder()
+bm25 = load_bm25(BM25_PATH)
+query_cache = load_query_cache()
+reranker = load_reranker()
+write_to_chroma = chroma_writer(collection)
+
+# Session State: the full transcript, for display only. Answers come from the documents
+# alone, so no history is summarised or sent anywhere
+if "chat_history" not in st.session_state:
+    st.session_state.chat_history = []
+
+# Keep the lexical index in step with the collection
+def write_chunks(ids, documents, embeddings, metadatas):
+    write_to_chroma(ids, documents, embeddings, metadatas)
+    bm25.add(ids, documents)
+    query_cache.invalidate()
+
+# BM25 first: an id left behind by a crash in between is then only in Chroma,
+# whose results carry their own text
+def delete_chunks(ids):
+    bm25.remove(ids)
+    collection.delete(ids=ids)
+    query_cache.invalidate()
+
+def hybrid_search(query_embedding, query, k=TOP_K):
+    # Dense and BM25 candidates merged with reciprocal rank fusion, then the
+    # cross-encoder keeps at most k that clear its confidence cutoff
+    results = collection.query(query_embeddings=[query_embedding], n_results=CANDIDATES)
+    dense_ids = results["ids"][0]
+    texts = dict(zip(dense_ids, results["documents"][0]))
+    lexical_ids = [doc_id for doc_id, _ in bm25.search(query, CANDIDATES)]
+    fused_ids = reciprocal_rank_fusion([dense_ids, lexical_ids], top_n=CANDIDATES)
+
+    missing = [doc_id for doc_id in fused_ids if doc_id not in texts]
+    if missing:
+        fetched = collection.get(ids=missing)
+        texts.update(zip(fetched["ids"], fetched["documents"]))
+    # A BM25 id Chroma no longer has (e.g. after an interrupted delete) is skipped
+    candidates = [texts[doc_id] for doc_id in fused_ids if doc_id in texts]
+    return [candidates[i] for i, _ in reranker.rerank(query, candidates, top_k=k)]
+
+def ingest_job(ctx):
+    # Runs on the job worker thread; queries keep reading the collection meanwhile
+    parse_times = {}
+    indexer = IncrementalIndexer(ChromaManifest(collection))
+
+    def write(ids, documents, embeddings, metadatas):
+        # Chroma persists each add and BM25 logs it before returning, so the
+        # checkpoint never covers chunks a restart would not see
+        write_chunks(ids, documents, embeddings, metadatas)
+        ctx.commit(ids)
+
+    items = ctx.track_files(iter_file_chunk_items(ctx.files, indexer, parse_times))
+    stats = run_pipeline(
+        items,
+        embedder,
+        write,
+        batch_size=EMBED_BATCH_SIZE,
+        write_batch_size=WRITE_BATCH_SIZE
+    )
+    sync = indexer.finish(delete_chunks)
+    bm25.maybe_compact()
+    return {**sync, "chunks_per_sec": stats["chunks_per_sec"], "parse_times": parse_times}
+
+# One worker per server process, outside the rerun cycle; jobs survive restarts
+@st.cache_resource
+def load_job_worker():
+    return JobWorker(JobQueue(os.path.join(DEFAULT_JOBS_DIR, "rag_collection")), ingest_job)
+
+job_worker = load_job_worker()
 
 # Upload 
 st.sidebar.header("📂 Upload Documents")
@@ -61,24 +121,17 @@ uploaded_files = st.sidebar.file_uploader(
 )
 
 if uploaded_files and st.sidebar.button("Process Documents"):
-    with st.spinner("Processing documents..."):
-        doc_id = collection.count()
-        for file in uploaded_files:
-            if file.type == "application/pdf":
-                text = read_pdf(file)
-            elif file.type == "text/plain":
-                text = read_txt(file)
-            else:
-                text = read_docx(file)
-
-            chunks = chunk_text(text)
-            for chunk in chunks:
-                collection.add(
-                    documents=[chunk],
-                    ids=[f"doc_{doc_id}"]
-                )
-                doc_id += 1
-    st.sidebar.success("Documents indexed successfully!")
+    job_worker.submit(uploaded_files)
+    st.sidebar.info("Queued for indexing; you can keep chatting meanwhile.")
+
+with st.sidebar:
+    show_jobs(job_worker.queue)
+
+cache_stats = query_cache.stats()
+st.sidebar.caption(
+    f"Query cache hit rate: vectors {cache_stats['vectors']['hit_rate']:.0%}, "
+    f"results {cache_stats['results']['hit_rate']:.0%}"
+)
 
 # Chat Display 
 st.subheader("💬 Chat")
@@ -95,14 +148,16 @@ if query:
     st.session_state.chat_history.append({"role": "user", "content": query})
 
     
-    results = collection.query(
-        query_texts=[query],
-        n_results=3
+    query_embedding = query_cache.embed(query, lambda q: embedder.encode(q).tolist())
+    retrieved = query_cache.search(
+        query_embedding, TOP_K, lambda: hybrid_search(query_embedding, query)
     )
+    context = "\n\n".join(retrieved)
 
-    context = "\n\n".join(results["documents"][0])
-
-    answer = f"Based on the uploaded documents, here is the relevant information:\n\n{context}"
+    if context:
+        answer = f"Based on the uploaded documents, here is the relevant information:\n\n{context}"
+    else:
+        answer = "No passage in the uploaded documents answers this confidently."
 
     st.session_state.chat_history.append({"role": "assistant", "content": answer})
 
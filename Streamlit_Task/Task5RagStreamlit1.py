@@ -1,79 +1,140 @@
 
 
 import streamlit as st
-from pypdf import PdfReader
-from docx import Document
-from sentence_transformers import SentenceTransformer
-from pinecone import Pinecone, ServerlessSpec
 import os
+import sys
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rag_utils.hybrid import reciprocal_rank_fusion
+from rag_utils.ingest import run_pipeline
+from rag_utils.jobs import DEFAULT_JOBS_DIR, JobQueue, JobWorker
+from rag_utils.manifest import IncrementalIndexer, JsonManifest
+from rag_utils.streamlit_app import (
+    iter_file_chunk_items, load_bm25, load_embedder, load_query_cache, load_reranker, show_jobs
+)
+from rag_utils.vector_store import make_store
+
 load_dotenv()
-import uuid
 
 # CONFIG 
 st.set_page_config(page_title="RAG Chat App", layout="wide")
-st.title("📄 RAG Chat App (Chat + Pinecone)")
-
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-try:
-    if not PINECONE_API_KEY:
-        PINECONE_API_KEY = st.secrets.get("PINECONE_API_KEY") if hasattr(st, "secrets") else None
-except Exception:
-    PINECONE_API_KEY = None
 
-if not PINECONE_API_KEY:
-    st.error("Pinecone API key not found. Set the `PINECONE_API_KEY` environment variable or add it to `.streamlit/secrets.toml`.")
-    st.stop()
+# "pinecone" (remote serverless index) or "local" (embedded NumPy index, no round trip)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+INDEX_NAME = "rag-chat-index" if VECTOR_BACKEND == "pinecone" else "rag-chat-local"
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "rag_utils")
+# Tenant partition inside the index; "" is the default namespace
+NAMESPACE = os.getenv("INDEX_NAMESPACE", "")
+PARTITION = f"{INDEX_NAME}.{NAMESPACE}" if NAMESPACE else INDEX_NAME
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", os.path.join(CACHE_DIR, PARTITION))
+MANIFEST_PATH = os.getenv("INDEX_MANIFEST", os.path.join(CACHE_DIR, f"{PARTITION}.manifest.json"))
+BM25_PATH = os.getenv("BM25_INDEX", os.path.join(CACHE_DIR, f"{PARTITION}.bm25.pkl"))
+TOP_K = 3
+CANDIDATES = 10
+
+st.title(f"📄 RAG Chat App (Chat + {'Pinecone' if VECTOR_BACKEND == 'pinecone' else 'Local Index'})")
+
+PINECONE_API_KEY = None
+if VECTOR_BACKEND == "pinecone":
+    PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
+    try:
+        if not PINECONE_API_KEY:
+            PINECONE_API_KEY = st.secrets.get("PINECONE_API_KEY") if hasattr(st, "secrets") else None
+    except Exception:
+        PINECONE_API_KEY = None
 
-# Embedding Model 
-@st.cache_resource
-def load_embedder():
-    return SentenceTransformer("all-MiniLM-L6-v2")
+    if not PINECONE_API_KEY:
+        st.error("Pinecone API key not found. Set the `PINECONE_API_KEY` environment variable or add it to `.streamlit/secrets.toml`.")
+        st.stop()
 
 embedder = load_embedder()
 
-# Pinecone Setup 
+# Vector Store Setup 
 @st.cache_resource
 def load_pinecone():
+    from pinecone import Pinecone, ServerlessSpec
+
     pc = Pinecone(api_key=PINECONE_API_KEY)
-    index_name = "rag-chat-index"
 
-    if index_name not in pc.list_indexes().names():
+    if INDEX_NAME not in pc.list_indexes().names():
         pc.create_index(
-            name=index_name,
+            name=INDEX_NAME,
             dimension=384,
             metric="cosine",
             spec=ServerlessSpec(cloud="aws", region="us-east-1")
         )
-    return pc.Index(index_name)
+    return pc.Index(INDEX_NAME)
 
-index = load_pinecone()
+@st.cache_resource
+def load_store():
+    if VECTOR_BACKEND == "pinecone":
+        return make_store("pinecone", index=load_pinecone())
+    return make_store("local", dimension=384, path=LOCAL_INDEX_PATH)
 
-# Session State 
+store = load_store()
+
+bm25 = load_bm25(BM25_PATH)
+query_cache = load_query_cache()
+reranker = load_reranker()
+
+# Session State: the full transcript, for display only. Answers come from the documents
+# alone, so no history is summarised or sent anywhere
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
 # Helpers 
-def read_pdf(file):
-    reader = PdfReader(file)
-    return "\n".join([page.extract_text() for page in reader.pages if page.extract_text()])
-
-def read_docx(file):
-    doc = Document(file)
-    return "\n".join([p.text for p in doc.paragraphs])
-
-def read_txt(file):
-    return file.read().decode("utf-8")
-
-def chunk_text(text, chunk_size=500, overlap=50):
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = start + chunk_size
-        chunks.append(text[start:end])
-        start = end - overlap
-    return chunks
+def write_chunks(ids, documents, embeddings, metadatas):
+    store.upsert(ids, embeddings, metadatas, namespace=NAMESPACE)
+    bm25.add(ids, documents, payloads=metadatas)
+    query_cache.invalidate()
+
+# BM25 first: an id left behind by a crash in between is then only in the vector
+# store, whose matches carry their own text
+def delete_chunks(ids):
+    bm25.remove(ids)
+    store.delete(ids, namespace=NAMESPACE)
+    query_cache.invalidate()
+
+def hybrid_search(query_embedding, query, k=TOP_K, filter=None):
+    # Dense and BM25 candidates merged with reciprocal rank fusion, then the
+    # cross-encoder keeps at most k that clear its confidence cutoff. The
+    # filter narrows both sides before scoring.
+    matches = store.query(query_embedding, top_k=CANDIDATES, filter=filter, namespace=NAMESPACE)
+    metadata = {match["id"]: match["metadata"] for match in matches}
+    dense_ids = list(metadata)
+    lexical_ids = [doc_id for doc_id, _ in bm25.search(query, CANDIDATES, filter=filter)]
+    fused_ids = reciprocal_rank_fusion([dense_ids, lexical_ids], top_n=CANDIDATES)
+    candidates = [metadata.get(doc_id) or bm25.payload(doc_id) for doc_id in fused_ids]
+    candidates = [meta for meta in candidates if meta]
+    ranked = reranker.rerank(query, [meta["text"] for meta in candidates], top_k=k)
+    return [candidates[i] for i, _ in ranked]
+
+def ingest_job(ctx):
+    # Runs on the job worker thread; queries keep reading the index meanwhile
+    parse_times = {}
+    indexer = IncrementalIndexer(JsonManifest(MANIFEST_PATH), namespace=NAMESPACE)
+
+    def write(ids, documents, embeddings, metadatas):
+        # Both indexes log each batch durably before returning (Pinecone is remote),
+        # so the checkpoint never runs ahead of what a restart can see
+        write_chunks(ids, documents, embeddings, metadatas)
+        ctx.commit(ids)
+
+    items = ctx.track_files(iter_file_chunk_items(ctx.files, indexer, parse_times, include_text=True))
+    stats = run_pipeline(items, embedder, write, write_batch_size=1000)
+    sync = indexer.finish(delete_chunks)
+    # Fold the write logs into the snapshots once they have outgrown them
+    store.save()
+    bm25.maybe_compact()
+    return {**sync, "chunks_per_sec": stats["chunks_per_sec"], "parse_times": parse_times}
+
+# One worker per server process, outside the rerun cycle; jobs survive restarts
+@st.cache_resource
+def load_job_worker():
+    return JobWorker(JobQueue(os.path.join(DEFAULT_JOBS_DIR, PARTITION)), ingest_job)
+
+job_worker = load_job_worker()
 
 # Sidebar 
 st.sidebar.header("📂 Document Upload")
@@ -84,31 +145,43 @@ uploaded_files = st.sidebar.file_uploader(
 )
 
 if uploaded_files and st.sidebar.button("Process Documents"):
-    with st.spinner("Embedding & uploading to Pinecone..."):
-        for file in uploaded_files:
-            if file.type == "application/pdf":
-                text = read_pdf(file)
-            elif file.type == "text/plain":
-                text = read_txt(file)
-            else:
-                text = read_docx(file)
-
-            chunks = chunk_text(text)
-            embeddings = embedder.encode(chunks).tolist()
-
-            vectors = []
-            for chunk, emb in zip(chunks, embeddings):
-                vectors.append(
-                    (
-                        str(uuid.uuid4()),
-                        emb,
-                        {"text": chunk, "source": file.name}
-                    )
-                )
-
-            index.upsert(vectors=vectors)
-
-    st.sidebar.success("Documents indexed in Pinecone!")
+    job_worker.submit(uploaded_files)
+    st.sidebar.info("Queued for indexing; you can keep chatting meanwhile.")
+
+with st.sidebar:
+    show_jobs(job_worker.queue)
+
+# Only indexing jobs add or remove sources and chunks, so the cached answers below are
+# keyed on the latest job's state and refresh once it moves on
+latest_job = tuple((job["id"], job["status"]) for job in job_worker.queue.recent(1))
+
+@st.cache_data(show_spinner=False)
+def load_sources(latest_job):
+    return JsonManifest(MANIFEST_PATH).sources()
+
+# Search scope: restricting to some sources filters before vector scoring
+selected_sources = st.sidebar.multiselect("Search in", load_sources(latest_job))
+source_filter = {"source": {"$in": selected_sources}} if selected_sources else None
+
+# describe_index_stats is a network round trip on Pinecone: also reuse it for at most 30 s
+@st.cache_data(ttl=30, show_spinner=False)
+def load_partition_stats(latest_job):
+    return store.partition_stats()
+
+partition = load_partition_stats(latest_job).get(NAMESPACE)
+if partition:
+    st.sidebar.caption(f"Namespace '{NAMESPACE or 'default'}': {partition['vector_count']} chunks")
+    if partition.get("queries"):
+        st.sidebar.caption(
+            f"Filters skipped {partition['scan_avoided']:.0%} of rows "
+            f"over {partition['queries']} queries"
+        )
+
+cache_stats = query_cache.stats()
+st.sidebar.caption(
+    f"Query cache hit rate: vectors {cache_stats['vectors']['hit_rate']:.0%}, "
+    f"results {cache_stats['results']['hit_rate']:.0%}"
+)
 
 if st.sidebar.button("Clear Chat"):
     st.session_state.chat_history = []
@@ -129,20 +202,20 @@ if query:
 
     with st.chat_message("assistant"):
         with st.spinner("Searching documents..."):
-            query_embedding = embedder.encode(query).tolist()
+            query_embedding = query_cache.embed(query, lambda q: embedder.encode(q).tolist())
 
-            search_result = index.query(
-                vector=query_embedding,
-                top_k=3,
-                include_metadata=True
+            matches = query_cache.search(
+                query_embedding, TOP_K,
+                lambda: hybrid_search(query_embedding, query, filter=source_filter),
+                filter=source_filter
             )
 
             contexts = [
-                f"**Source:** {match['metadata']['source']}\n{match['metadata']['text']}"
-                for match in search_result["matches"]
+                f"**Source:** {meta['source']}\n{meta['text']}"
+                for meta in matches
             ]
 
-            answer = "\n\n---\n\n".join(contexts)
+            answer = "\n\n---\n\n".join(contexts) or "No passage in the uploaded documents answers this confidently."
             st.markdown(answer)
 
     st.session_state.chat_history.append({"role": "assistant", "content": answer})
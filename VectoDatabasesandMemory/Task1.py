@@ -1,7 +1,11 @@
-from sentence_transformers import SentenceTransformer
+import os
+import sys
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rag_utils.embedding_cache import load_cached_model
 
-model = SentenceTransformer('all-MiniLM-L6-v2')
+
+model = load_cached_model("all-MiniLM-L6-v2")
 
 sentences = [
     "Machine learning is transforming the world",
@@ -13,3 +17,4 @@ embeddings = model.encode(sentences)
 print("Number of sentences:", len(embeddings))
 print("Embedding size:", len(embeddings[0]))
 print("First embedding (first 10 values):", embeddings[0][:10])
+print("Embedding cache:", model.stats())
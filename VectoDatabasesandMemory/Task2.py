@@ -1,8 +1,25 @@
-from sentence_transformers import SentenceTransformer
-import numpy as np
-import faiss
+import argparse
+import os
+import sys
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rag_utils.embedding_cache import load_cached_model
+from rag_utils.faiss_index import (
+    INDEX_TYPES, build_index, index_type, open_store, recall_at_k, save_store,
+    set_search_params, store_exists
+)
+
+parser = argparse.ArgumentParser(description="FAISS vector search")
+parser.add_argument("--index", choices=INDEX_TYPES, default="flat", help="index type")
+parser.add_argument("--nlist", type=int, default=None, help="IVF lists (default ~4*sqrt(n))")
+parser.add_argument("--nprobe", type=int, default=8, help="IVF lists probed per query")
+parser.add_argument("--ef-search", type=int, default=64, help="HNSW search breadth")
+parser.add_argument("--store", default=None,
+                    help="index directory: opened memory-mapped if it exists, otherwise built and saved there")
+parser.add_argument("--k", type=int, default=3, help="top results")
+args = parser.parse_args()
+
+model = load_cached_model("all-MiniLM-L6-v2")
 
 documents = [
     "Machine learning is transforming the world",
@@ -12,24 +29,36 @@ documents = [
     "Sports improve physical and mental health"
 ]
 
-embeddings = model.encode(documents)
-
-
-dimension = embeddings.shape[1]  # 384
-index = faiss.IndexFlatL2(dimension)  # L2 distance
-
-index.add(embeddings)
+if args.store and store_exists(args.store):
+    # Cold start: no re-encoding; documents (and IVF lists) are paged in on demand.
+    # The saved index keeps its own type, whatever --index says
+    index, documents = open_store(args.store)
+    embeddings = None
+else:
+    embeddings = model.encode(documents)
+    index = build_index(embeddings, args.index, nlist=args.nlist)
+    if args.store:
+        save_store(args.store, index, documents)
+set_search_params(index, nprobe=args.nprobe, ef_search=args.ef_search)
 
+print("Index type:", index_type(index))
 print("Total vectors in index:", index.ntotal)
 
 
 query = "AI and machine learning"
 query_embedding = model.encode([query])
 
-k = 3  # top results
+k = args.k  # top results
 distances, indices = index.search(query_embedding, k)
 
 print("Query:", query)
 print("\nTop results:")
 for idx in indices[0]:
-    print("-", documents[idx])
\ No newline at end of file
+    if idx >= 0:
+        print("-", documents[idx])
+
+if index_type(index) != "flat" and embeddings is not None:
+    # Compare against exact search, using every document as a query too
+    exact = build_index(embeddings, "flat")
+    queries = model.encode([query] + list(documents))
+    print(f"\nrecall@{k} vs flat:", recall_at_k(index, exact, queries, k))
@@ -1,4 +1,12 @@
-from sentence_transformers import SentenceTransformer
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rag_utils.answer_cache import SemanticAnswerCache
+from rag_utils.embedding_cache import load_cached_model
+from rag_utils.hybrid import BM25Index, reciprocal_rank_fusion
+from rag_utils.rerank import Reranker
 import chromadb
 from transformers import pipeline
 
@@ -10,35 +18,64 @@ documents = [
     "Sentence transformers generate semantic embeddings."
 ]
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
+model = load_cached_model("all-MiniLM-L6-v2")
 
 client = chromadb.Client()
 collection = client.get_or_create_collection(name="rag_collection")
 
+doc_ids = [str(i) for i in range(len(documents))]
 embeddings = model.encode(documents).tolist()
 collection.add(
     documents=documents,
     embeddings=embeddings,
-    ids=[str(i) for i in range(len(documents))]
+    ids=doc_ids
 )
 
-query = "What is RAG?"
-query_embedding = model.encode([query]).tolist()
+# Lexical index built alongside the vectors, for exact terms the embedder misses
+bm25 = BM25Index()
+bm25.add(doc_ids, documents)
 
-results = collection.query(
-    query_embeddings=query_embedding,
-    n_results=2
+k = 2
+candidates = 5
+
+reranker = Reranker()
+
+generator = pipeline(
+    task="text-generation",
+    model="openai-community/gpt2",
+    max_new_tokens=80,
+    temperature=0.7,
+    do_sample=False
 )
 
-retrieved_docs = results["documents"][0]
+# Paraphrases of an answered question reuse its answer while the context is unchanged
+answer_cache = SemanticAnswerCache(threshold=0.92)
+
+
+def retrieve(query, query_embedding):
+    results = collection.query(
+        query_embeddings=[query_embedding],
+        n_results=candidates
+    )
+
+    # Reciprocal rank fusion of dense and BM25 rankings gives a wide candidate set;
+    # the cross-encoder scores it in one batch and only confident passages are kept
+    dense_ids = results["ids"][0]
+    lexical_ids = [doc_id for doc_id, _ in bm25.search(query, candidates)]
+    fused_ids = reciprocal_rank_fusion([dense_ids, lexical_ids], top_n=candidates)
+    candidate_docs = [documents[int(doc_id)] for doc_id in fused_ids]
+
+    ranked = reranker.rerank(query, candidate_docs, top_k=k)
+    print("Retrieved context:")
+    for i, score in ranked:
+        print(f"- ({score:.2f})", candidate_docs[i])
+    return [fused_ids[i] for i, _ in ranked], [candidate_docs[i] for i, _ in ranked]
 
-print("Retrieved context:")
-for doc in retrieved_docs:
-    print("-", doc)
 
-context = "\n".join(retrieved_docs)
+def generate(query, retrieved_docs):
+    context = "\n".join(retrieved_docs)
 
-prompt = f"""
+    prompt = f"""
 Answer the question using ONLY the context below.
 
 Context:
@@ -50,22 +87,34 @@ Question:
 Answer:
 """
 
-print("\nFINAL PROMPT SENT TO LLM:\n")
-print(prompt)
+    print("\nFINAL PROMPT SENT TO LLM:\n")
+    print(prompt)
 
-generator = pipeline(
-    task="text-generation",
-    model="openai-community/gpt2",
-    max_new_tokens=80,
-    temperature=0.7,
-    do_sample=False
-)
+    outputs = generator(prompt)
+    full_text = outputs[0]["generated_text"]
+
+    gen = full_text[len(prompt):].strip()
+
+    return gen.split("Question:")[0].strip()
+
+
+questions = ["What is RAG?", "What does RAG stand for?", "What is ChromaDB?"]
 
-outputs = generator(prompt)
-full_text = outputs[0]["generated_text"]
+for query in questions:
+    print(f"\n=== {query} ===")
+    query_embedding = model.encode(query, normalize_embeddings=True).tolist()
+    context_ids, retrieved_docs = retrieve(query, query_embedding)
 
-gen = full_text[len(prompt):].strip()
+    gen = answer_cache.lookup(query_embedding, context_ids)
+    if gen is None:
+        t0 = time.perf_counter()
+        gen = generate(query, retrieved_docs)
+        answer_cache.store(query_embedding, context_ids, gen, time.perf_counter() - t0)
+    else:
+        print("(answer cache hit, generation skipped)")
 
-gen = gen.split("Question:")[0].strip()
+    print("\nRAG ANSWER:\n", gen)
 
-print("\nRAG ANSWER:\n", gen)
\ No newline at end of file
+stats = answer_cache.stats()
+print(f"\nAnswer cache: {stats['hits']} hits, {stats['misses']} misses, "
+      f"{stats['saved_seconds']:.1f}s of generation saved")
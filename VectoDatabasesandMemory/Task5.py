@@ -1,45 +1,52 @@
 
 from google.colab import files
-from pypdf import PdfReader
-from sentence_transformers import SentenceTransformer
+import os
+import sys
+
+# Pasted into a Colab cell there is no __file__: the cwd is then used, which works from
+# this folder of a clone or from the repository root (see README, "Run in Google Colab")
+try:
+    HERE = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    HERE = os.getcwd()
+sys.path.extend([os.path.join(HERE, ".."), HERE])
+from rag_utils.embedding_cache import load_cached_model
+from rag_utils.doc_cache import DocumentCache
+from rag_utils.ingest import chroma_writer, run_pipeline
+from rag_utils.readers import iter_pdf_pages
 import chromadb
+import io
 import uuid
 
 uploaded = files.upload()   # upload: sample.pdf
 pdf_name = list(uploaded.keys())[0]
 pdf_path = f"/content/{pdf_name}"
 
-def load_pdf(path):
-    reader = PdfReader(path)
-    return "\n".join(page.extract_text() or "" for page in reader.pages)
-
-def chunk_text(text, chunk_size=300, overlap=50):
-    chunks = []
-    start = 0
-    while start < len(text):
-        chunk = text[start:start + chunk_size].strip()
-        if len(chunk) > 30:
-            chunks.append(chunk)
-        start += chunk_size - overlap
-    return chunks
+# Text and chunk offsets of PDFs seen before are reused, keyed by file hash
+doc_cache = DocumentCache()
 
-pdf_text = load_pdf(pdf_path)
-chunks = chunk_text(pdf_text)
+def load_pdf(path):
+    # Returns the cache key and a callable yielding one page of text at a time
+    with open(path, "rb") as f:
+        data = f.read()
+    return doc_cache.key(data), lambda: iter_pdf_pages(io.BytesIO(data))
 
-print("Total chunks:", len(chunks))
+def chunk_text(pdf, chunk_size=300, overlap=50):
+    # Sentence-aware windows; a tail of 30 chars or fewer is merged into the previous chunk
+    key, pages = pdf
+    return doc_cache.chunks(key, pages, chunk_size, overlap, min_chars=30)
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
-embeddings = model.encode(chunks).tolist()
+model = load_cached_model("all-MiniLM-L6-v2")
 
 client = chromadb.Client()
 collection = client.get_or_create_collection("pdf_vectors")
 
-collection.add(
-    documents=chunks,
-    embeddings=embeddings,
-    ids=[str(uuid.uuid4()) for _ in range(len(chunks))]
-)
+items = ((str(uuid.uuid4()), chunk, None) for chunk in chunk_text(load_pdf(pdf_path)))
+stats = run_pipeline(items, model, chroma_writer(collection))
 
+print("Total chunks:", stats["chunks"])
+print(f"Throughput: {stats['chunks_per_sec']:.1f} chunks/sec")
+print("Document cache:", "hit" if doc_cache.hits else "miss (text and offsets now cached)")
 print("PDF vector index created.")
 
 query = "What is this PDF about?"
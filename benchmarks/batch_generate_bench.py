@@ -0,0 +1,55 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from gen_utils.batching import load_batch_generator
+
+PROMPTS = [
+    "The future of artificial intelligence is",
+    "MongoDB stores documents as",
+    "Once upon a time in a small village",
+    "The best way to learn Python is",
+    "Vector databases are useful because",
+    "In the morning I usually",
+]
+
+
+def run(generator, requests, concurrency, max_length):
+    def one(i):
+        t = time.perf_counter()
+        generator.generate(PROMPTS[i % len(PROMPTS)], max_length=max_length)
+        return time.perf_counter() - t
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - t0
+    return requests / elapsed, np.percentile(latencies, [50, 95])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GPT-2 requests/sec with and without micro-batching")
+    parser.add_argument("--model", default="gpt2")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--max-length", type=int, default=50)
+    parser.add_argument("--wait-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent, max_length {args.max_length}")
+    for batch_size in (1, 4, 8, 16):
+        generator = load_batch_generator(args.model, max_batch_size=batch_size,
+                                         max_wait_ms=args.wait_ms, do_sample=False)
+        rps, (p50, p95) = run(generator, args.requests, args.concurrency, args.max_length)
+        mean_batch = generator.batch_sizes.sum / max(generator.batch_sizes.count, 1)
+        print(f"max batch {batch_size:>2}: {rps:6.2f} req/s  p50 {p50:5.2f}s  p95 {p95:5.2f}s  "
+              f"mean batch {mean_batch:4.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rag_utils.chunker import chunk_spans, iter_text_chunks, token_spans
+
+WORDS = (
+    "the model data vector index query search chunk embedding document page "
+    "retrieval latency throughput memory cache batch token sentence paragraph"
+).split()
+
+
+def make_corpus(size_mb, seed=0):
+    rng = random.Random(seed)
+    target = size_mb * 1024 * 1024
+    parts, size = [], 0
+    while size < target:
+        sentences = []
+        for _ in range(rng.randint(3, 8)):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(6, 20))]
+            sentences.append(" ".join(words).capitalize() + rng.choice(".!?"))
+        para = " ".join(sentences)
+        parts.append(para)
+        size += len(para) + 2
+    return "\n\n".join(parts)
+
+
+def legacy_chunk_text(text, chunk_size=500, overlap=50):
+    # The chunker the Streamlit apps used before rag_utils/chunker.py
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = start + chunk_size
+        chunks.append(text[start:end])
+        start = end - overlap
+    return chunks
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run(name, fn, size_mb):
+    t0 = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - t0
+    print(f"{name:<22} {count:>10} chunks {elapsed:>8.2f}s {size_mb / elapsed:>8.1f} MB/s"
+          f"  peak RSS {peak_rss_mb():.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunker throughput benchmark")
+    parser.add_argument("--size-mb", type=int, default=100, help="synthetic corpus size")
+    parser.add_argument("--corpus", default=None, help="UTF-8 text file to use instead")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--overlap", type=int, default=50)
+    parser.add_argument("--tokens", action="store_true",
+                        help="also time token windows with the MiniLM tokenizer")
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, "r", encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = make_corpus(args.size_mb)
+    size_mb = len(text.encode("utf-8")) / (1024 * 1024)
+    print(f"Corpus: {size_mb:.1f} MB, chunk_size={args.chunk_size}, overlap={args.overlap}")
+
+    run("offsets (chunk_spans)",
+        lambda: sum(1 for _ in chunk_spans(text, args.chunk_size, args.overlap)), size_mb)
+    pages = [text[i:i + 4096] for i in range(0, len(text), 4096)]
+    run("streaming (4KB pages)",
+        lambda: sum(1 for _ in iter_text_chunks(pages, args.chunk_size, args.overlap)), size_mb)
+    del pages
+    # Legacy last: it holds every chunk string at once, which inflates peak RSS
+    run("legacy chunk_text",
+        lambda: len(legacy_chunk_text(text, args.chunk_size, args.overlap)), size_mb)
+
+    if args.tokens:
+        from transformers import AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained("sentence-transformers/all-MiniLM-L6-v2")
+        sample = text[:10 * 1024 * 1024]
+        sample_mb = len(sample) / (1024 * 1024)
+        run("token windows (10 MB)",
+            lambda: sum(1 for _ in token_spans(sample, tokenizer)), sample_mb)
+
+
+if __name__ == "__main__":
+    main()
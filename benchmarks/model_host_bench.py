@@ -0,0 +1,127 @@
+import argparse
+import gc
+import multiprocessing as mp
+import os
+import secrets
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(ROOT)
+from gen_utils.model_host import RemoteGenerator, load_model
+from gen_utils.batching import load_batch_generator
+
+PROMPT = "The future of artificial intelligence is"
+MB = 1024 * 1024
+
+_preloaded = None  # set in the parent before forking (preload mode)
+
+
+def memory(pid):
+    """RSS, PSS and USS in MB from /proc/<pid>/smaps_rollup (Linux).
+
+    PSS splits shared pages between the processes mapping them, so summing it
+    over processes gives the real footprint; RSS counts shared weights N times.
+    """
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    uss = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return fields["Rss"] / MB, fields["Pss"] / MB, uss / MB
+
+
+def _worker(mode, model_name, socket_path, ready, stop):
+    if mode == "socket":
+        generator = RemoteGenerator(model_name, path=socket_path)
+    elif mode == "preload":
+        generator = _preloaded
+    else:
+        generator = load_batch_generator(model_name, do_sample=False)
+    generator.generate(PROMPT, max_length=20)
+    ready.put(os.getpid())
+    stop.wait()
+
+
+def _start_server(model_name, socket_path):
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gen_utils.model_host", "--model", model_name, "--socket", socket_path],
+        cwd=ROOT, stdout=subprocess.DEVNULL
+    )
+    client = RemoteGenerator(model_name, path=socket_path)
+    while True:
+        if server.poll() is not None:
+            raise RuntimeError("model host exited during startup")
+        try:
+            client.ping()
+            return server
+        except (FileNotFoundError, ConnectionRefusedError):
+            time.sleep(0.1)
+
+
+def run(mode, model_name, workers):
+    global _preloaded
+    extra = []  # processes that are not web workers but hold memory: master or model host
+    socket_path = os.path.join(tempfile.mkdtemp(), "model.sock")
+    t0 = time.perf_counter()
+    if mode == "preload":
+        ctx = mp.get_context("fork")
+        model, tokenizer = load_model(model_name)
+        from gen_utils.batching import BatchGenerator
+
+        _preloaded = BatchGenerator(model, tokenizer, do_sample=False)
+        gc.freeze()
+        extra.append(os.getpid())
+    else:
+        ctx = mp.get_context("spawn")
+    server = _start_server(model_name, socket_path) if mode == "socket" else None
+    if server:
+        extra.append(server.pid)
+
+    ready, stop = ctx.Queue(), ctx.Event()
+    procs = [ctx.Process(target=_worker, args=(mode, model_name, socket_path, ready, stop))
+             for _ in range(workers)]
+    for p in procs:
+        p.start()
+    pids = [ready.get() for _ in procs]
+    startup = time.perf_counter() - t0
+
+    worker_mem = [memory(pid) for pid in pids]
+    extra_mem = [memory(pid) for pid in extra]
+    stop.set()
+    for p in procs:
+        p.join()
+    if server:
+        server.terminate()
+        server.wait()
+
+    rss = sum(m[0] for m in worker_mem) / workers
+    pss = sum(m[1] for m in worker_mem) / workers
+    uss = sum(m[2] for m in worker_mem) / workers
+    total = sum(m[1] for m in worker_mem + extra_mem)
+    print(f"{mode:<12} startup {startup:6.2f}s  per worker: RSS {rss:7.1f} MB  PSS {pss:7.1f} MB  "
+          f"USS {uss:7.1f} MB  |  total PSS {total:7.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time and memory per worker for each model-host mode")
+    parser.add_argument("--model", default="gpt2")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", nargs="+", default=["per-process", "preload", "socket"],
+                        choices=["per-process", "preload", "socket"])
+    args = parser.parse_args()
+    # The host and the spawned workers inherit the key through the environment
+    os.environ.setdefault("MODEL_HOST_AUTHKEY", secrets.token_hex(32))
+
+    print(f"{args.workers} workers, {args.model}; startup = until every worker has answered one request")
+    # preload loads the model into this process, so it runs last
+    for mode in sorted(args.modes, key=lambda m: m == "preload"):
+        run(mode, args.model, args.workers)
+
+
+if __name__ == "__main__":
+    main()
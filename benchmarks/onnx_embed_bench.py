@@ -0,0 +1,61 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rag_utils.onnx_encoder import cosine_drift, load_onnx_encoder
+
+WORDS = (
+    "machine learning vector database retrieval embedding model query document "
+    "search index chunk token latency memory cache answer question context"
+).split()
+
+
+def make_sentences(n, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 40))) + "."
+            for _ in range(n)]
+
+
+def throughput(encoder, sentences, batch_size):
+    encoder.encode(sentences[:batch_size], batch_size=batch_size)  # warm-up
+    t0 = time.perf_counter()
+    encoder.encode(sentences, batch_size=batch_size)
+    return len(sentences) / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX int8 vs PyTorch MiniLM embeddings")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--sentences", type=int, default=1024)
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    sentences = make_sentences(args.sentences)
+    encoders = {
+        "torch fp32": SentenceTransformer(args.model, device="cpu"),
+        "onnx fp32": load_onnx_encoder(args.model, quantized=False),
+        "onnx int8": load_onnx_encoder(args.model, quantized=True),
+    }
+
+    reference = encoders["torch fp32"]
+    for name in ("onnx fp32", "onnx int8"):
+        drift = cosine_drift(encoders[name], reference, sentences)
+        print(f"{name} vs torch: cosine mean {drift['mean']:.5f}  p5 {drift['p5']:.5f}  "
+              f"min {drift['min']:.5f}")
+
+    print(f"\n{'sentences/sec':<12}" + "".join(f"{f'batch {b}':>12}" for b in (1, 32, 256)))
+    for name, encoder in encoders.items():
+        row = []
+        for batch_size in (1, 32, 256):
+            # Batch size 1 is slow; a smaller sample keeps the run short
+            sample = sentences[:128] if batch_size == 1 else sentences
+            row.append(throughput(encoder, sample, batch_size))
+        print(f"{name:<12}" + "".join(f"{r:>12.1f}" for r in row))
+
+
+if __name__ == "__main__":
+    main()
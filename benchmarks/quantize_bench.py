@@ -0,0 +1,160 @@
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from gen_utils.quantize import load_model
+
+GPT2_TEXT = [
+    "MongoDB is a document database. Instead of rows and columns it stores records as "
+    "JSON-like documents, which makes it easy to change the shape of the data as an "
+    "application grows.",
+    "The quick brown fox jumps over the lazy dog. This sentence contains every letter of "
+    "the English alphabet and has long been used to test typewriters and fonts.",
+    "Streamlit turns data scripts into shareable web apps in minutes. All in pure Python, "
+    "with no front-end experience required.",
+    "Machine learning models are trained on data. After training, a model can make "
+    "predictions on examples it has never seen before, which is called generalisation.",
+    "The weather was cold and grey, so we stayed inside, made a pot of tea and read books "
+    "by the window until the rain finally stopped in the evening.",
+]
+GPT2_PROMPTS = [
+    "The future of artificial intelligence is",
+    "MongoDB stores documents as",
+    "Once upon a time in a small village",
+    "The best way to learn Python is",
+]
+
+# (text, label) with 1 = POSITIVE; --sst2 uses the GLUE SST-2 validation split instead
+SENTIMENT = [
+    ("I love this!", 1), ("That was awful.", 0),
+    ("An absolute joy to watch from start to finish.", 1),
+    ("The plot made no sense and the acting was wooden.", 0),
+    ("Surprisingly good, I would happily see it again.", 1),
+    ("A boring, overlong mess.", 0),
+    ("The service was quick and the staff were friendly.", 1),
+    ("My order arrived broken and nobody answered my emails.", 0),
+    ("It does exactly what it says, no complaints.", 1),
+    ("I want my money back.", 0),
+    ("Beautifully shot and genuinely moving.", 1),
+    ("The battery dies within an hour.", 0),
+]
+
+
+def model_mb(model):
+    import torch
+
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / (1024 * 1024)
+
+
+def timed(fn, repeats):
+    fn()  # warm-up
+    times = []
+    for _ in range(repeats):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return np.median(times) * 1000
+
+
+def perplexity(model, tokenizer, texts):
+    import torch
+
+    nll, count = 0.0, 0
+    with torch.no_grad():
+        for text in texts:
+            ids = tokenizer(text, return_tensors="pt")["input_ids"]
+            loss = model(ids, labels=ids).loss
+            nll += loss.item() * (ids.shape[1] - 1)
+            count += ids.shape[1] - 1
+    return float(np.exp(nll / count))
+
+
+def bench_gpt2(args):
+    import torch
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained("gpt2")
+    tokenizer.pad_token = tokenizer.eos_token
+    tokenizer.padding_side = "left"
+    texts = GPT2_TEXT
+    if args.text:
+        with open(args.text, encoding="utf-8") as f:
+            texts = [p for p in f.read().split("\n\n") if p.strip()]
+
+    batch = (GPT2_PROMPTS * args.batch_size)[:args.batch_size]
+    outputs = {}
+    print(f"\ngpt2: perplexity on {len(texts)} passages, generate {args.new_tokens} tokens greedily")
+    for precision in ("fp32", "int8"):
+        model = load_model("gpt2", "AutoModelForCausalLM", precision)
+
+        def generate(prompts):
+            enc = tokenizer(prompts, return_tensors="pt", padding=True)
+            with torch.no_grad():
+                return model.generate(**enc, max_new_tokens=args.new_tokens, do_sample=False,
+                                      pad_token_id=tokenizer.eos_token_id)
+
+        single = timed(lambda: generate(batch[:1]), args.repeats)
+        batched = timed(lambda: generate(batch), args.repeats)
+        outputs[precision] = tokenizer.batch_decode(generate(batch), skip_special_tokens=True)
+        print(f"  {precision}: ppl {perplexity(model, tokenizer, texts):7.2f}  size {model_mb(model):6.1f} MB  "
+              f"latency batch 1 {single:7.1f} ms  batch {len(batch)} {batched:7.1f} ms")
+    same = sum(a == b for a, b in zip(outputs["fp32"], outputs["int8"]))
+    print(f"  greedy outputs identical to fp32: {same}/{len(batch)}")
+
+
+def bench_distilbert(args):
+    from gen_utils.quantize import load_pipeline
+
+    name = "distilbert-base-uncased-finetuned-sst-2-english"
+    data = SENTIMENT
+    if args.sst2:
+        from datasets import load_dataset
+
+        data = [(r["sentence"], r["label"]) for r in load_dataset("glue", "sst2", split="validation")]
+    texts = [t for t, _ in data]
+    labels = np.array([y for _, y in data])
+    batch = (texts * args.batch_size)[:args.batch_size]
+
+    predictions = {}
+    print(f"\n{name}: accuracy on {len(data)} labelled sentences")
+    for precision in ("fp32", "int8"):
+        classifier = load_pipeline("sentiment-analysis", name, precision)
+        single = timed(lambda: classifier(batch[:1]), args.repeats)
+        batched = timed(lambda: classifier(batch, batch_size=len(batch)), args.repeats)
+        predictions[precision] = np.array([r["label"] == "POSITIVE" for r in classifier(texts, batch_size=32)])
+        accuracy = (predictions[precision] == labels).mean()
+        print(f"  {precision}: accuracy {accuracy:6.1%}  size {model_mb(classifier.model):6.1f} MB  "
+              f"latency batch 1 {single:7.1f} ms  batch {len(batch)} {batched:7.1f} ms")
+    agree = (predictions["fp32"] == predictions["int8"]).mean()
+    print(f"  int8 labels agreeing with fp32: {agree:.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fp32 vs int8 dynamic quantization for GPT-2 and DistilBERT on CPU")
+    parser.add_argument("--models", nargs="+", default=["gpt2", "distilbert"], choices=["gpt2", "distilbert"])
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--new-tokens", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--text", help="plain-text file for GPT-2 perplexity (paragraphs split on blank lines)")
+    parser.add_argument("--sst2", action="store_true", help="score DistilBERT on the SST-2 validation set (needs datasets)")
+    args = parser.parse_args()
+
+    import torch
+
+    print(f"torch {torch.__version__}, {torch.get_num_threads()} threads, quantized engine "
+          f"{torch.backends.quantized.engine}")
+    if "gpt2" in args.models:
+        bench_gpt2(args)
+    if "distilbert" in args.models:
+        bench_distilbert(args)
+
+
+if __name__ == "__main__":
+    main()
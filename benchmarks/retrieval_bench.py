@@ -0,0 +1,195 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+BACKENDS = ("faiss-flat", "faiss-ivf", "faiss-hnsw", "chroma", "local")
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        # Peak rather than current RSS, but still comparable between runs
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def normalize(x):
+    return (x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)).astype(np.float32)
+
+
+def synthetic_corpus(n_docs, n_queries, dim, clusters=64, seed=0):
+    # Clustered vectors; each query is a noisy copy of a random document
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    docs = centers[rng.integers(0, clusters, n_docs)] + 0.35 * rng.normal(size=(n_docs, dim))
+    picks = rng.integers(0, n_docs, n_queries)
+    queries = docs[picks] + 0.2 * rng.normal(size=(n_queries, dim))
+    return normalize(docs), normalize(queries)
+
+
+def text_corpus(path, n_queries, seed=0):
+    # JSONL with {"text": ...} per line; queries are sampled documents' first sentence
+    from rag_utils.embedding_cache import load_cached_model
+
+    with open(path, "r", encoding="utf-8") as f:
+        texts = [json.loads(line)["text"] for line in f if line.strip()]
+    rng = np.random.default_rng(seed)
+    queries = [texts[i].split(". ")[0] for i in rng.integers(0, len(texts), n_queries)]
+    model = load_cached_model("all-MiniLM-L6-v2")
+    return (normalize(model.encode(texts, batch_size=64)),
+            normalize(model.encode(queries, batch_size=64)))
+
+
+def exact_top_k(docs, queries, k):
+    scores = queries @ docs.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return [set(row) for row in top]
+
+
+class FaissBackend:
+    def __init__(self, index_type):
+        self.index_type = index_type
+
+    def ingest(self, ids, vectors):
+        from rag_utils.faiss_index import build_index, set_search_params
+
+        self.index = build_index(vectors, self.index_type)
+        set_search_params(self.index, nprobe=16, ef_search=64)
+
+    def search(self, query, k):
+        _, rows = self.index.search(query[None, :], k)
+        return [int(r) for r in rows[0] if r >= 0]
+
+
+class ChromaBackend:
+    def ingest(self, ids, vectors):
+        import chromadb
+
+        client = chromadb.Client()
+        name = f"bench_{int(time.time() * 1000)}"
+        self.collection = client.create_collection(name, metadata={"hnsw:space": "cosine"})
+        batch = 5000
+        for start in range(0, len(ids), batch):
+            self.collection.add(
+                ids=[str(i) for i in ids[start:start + batch]],
+                embeddings=vectors[start:start + batch].tolist()
+            )
+
+    def search(self, query, k):
+        result = self.collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+        return [int(i) for i in result["ids"][0]]
+
+
+class LocalBackend:
+    def ingest(self, ids, vectors):
+        from rag_utils.vector_store import LocalStore
+
+        self.store = LocalStore(vectors.shape[1])
+        batch = 5000
+        for start in range(0, len(ids), batch):
+            chunk = ids[start:start + batch]
+            self.store.upsert([str(i) for i in chunk], vectors[start:start + batch], [{}] * len(chunk))
+
+    def search(self, query, k):
+        return [int(m["id"]) for m in self.store.query(query, k)]
+
+
+def make_backend(name):
+    if name.startswith("faiss-"):
+        return FaissBackend(name.split("-", 1)[1])
+    if name == "chroma":
+        return ChromaBackend()
+    if name == "local":
+        return LocalBackend()
+    raise ValueError(name)
+
+
+def run_backend(name, docs, queries, truth, k):
+    backend = make_backend(name)
+    ids = list(range(len(docs)))
+
+    rss_before = rss_mb()
+    t0 = time.perf_counter()
+    backend.ingest(ids, docs)
+    ingest_seconds = time.perf_counter() - t0
+    rss_after = rss_mb()
+
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        t = time.perf_counter()
+        found = backend.search(query, k)
+        latencies.append((time.perf_counter() - t) * 1000)
+        hits += len(expected & set(found))
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "ingest_seconds": ingest_seconds,
+        "ingest_vectors_per_sec": len(docs) / ingest_seconds if ingest_seconds > 0 else None,
+        "memory_mb": rss_after - rss_before,
+        "latency_ms": {"p50": p50, "p95": p95, "p99": p99, "mean": float(np.mean(latencies))},
+        f"recall@{k}": hits / (len(queries) * k)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k and latency across retrieval backends")
+    parser.add_argument("--docs", type=int, default=50_000, help="synthetic corpus size")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--corpus", default=None, help="JSONL of {\"text\": ...} to embed instead")
+    parser.add_argument("--backends", default=",".join(BACKENDS),
+                        help=f"comma separated subset of {', '.join(BACKENDS)}")
+    parser.add_argument("--out", default="retrieval_bench.json", help="JSON results file")
+    args = parser.parse_args()
+
+    if args.corpus:
+        docs, queries = text_corpus(args.corpus, args.queries)
+    else:
+        docs, queries = synthetic_corpus(args.docs, args.queries, args.dim)
+    truth = exact_top_k(docs, queries, args.k)
+    print(f"{len(docs)} docs, {len(queries)} queries, dim {docs.shape[1]}, k={args.k}")
+
+    results = {}
+    for name in args.backends.split(","):
+        name = name.strip()
+        try:
+            results[name] = run_backend(name, docs, queries, truth, args.k)
+        except ImportError as e:
+            results[name] = {"skipped": str(e)}
+            print(f"{name:<12} skipped ({e})")
+            continue
+        r = results[name]
+        print(f"{name:<12} ingest {r['ingest_vectors_per_sec']:>9.0f} vec/s  "
+              f"p50 {r['latency_ms']['p50']:6.2f} ms  p95 {r['latency_ms']['p95']:6.2f} ms  "
+              f"p99 {r['latency_ms']['p99']:6.2f} ms  mem {r['memory_mb']:7.1f} MB  "
+              f"recall@{args.k} {r[f'recall@{args.k}']:.3f}")
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "config": {
+            "docs": len(docs), "queries": len(queries), "dim": int(docs.shape[1]),
+            "k": args.k, "corpus": args.corpus or "synthetic"
+        },
+        "results": results
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=float)
+    print("Results written to", args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from gen_utils.quantize import load_model
+from gen_utils.speculative import SpeculativeStats, check_draft
+
+# The kinds of prompts the Flask / Streamlit apps get
+PROMPTS = [
+    "The future of artificial intelligence is",
+    "MongoDB stores documents as",
+    "Once upon a time in a small village",
+    "The best way to learn Python is",
+    "Vector databases are useful because",
+    "In the morning I usually",
+    "Write a short product description for a coffee mug:",
+    "The main difference between SQL and NoSQL databases is",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GPT-2 with and without a draft model (speculative decoding)")
+    parser.add_argument("--model", default="gpt2")
+    parser.add_argument("--draft", default="distilgpt2")
+    parser.add_argument("--new-tokens", type=int, default=64)
+    parser.add_argument("--draft-tokens", type=int, default=None,
+                        help="fixed draft length per round (default: transformers' adaptive schedule)")
+    parser.add_argument("--sample", action="store_true",
+                        help="sample (temperature 0.7) instead of greedy; exactness is then not checked")
+    parser.add_argument("--prompts", help="file with one prompt per line")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    import torch
+    from transformers import AutoTokenizer
+
+    prompts = PROMPTS
+    if args.prompts:
+        with open(args.prompts, encoding="utf-8") as f:
+            prompts = [line.strip() for line in f if line.strip()]
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = load_model(args.model)
+    draft = load_model(args.draft)
+    check_draft(model, draft)
+    if args.draft_tokens:
+        draft.generation_config.num_assistant_tokens = args.draft_tokens
+        draft.generation_config.num_assistant_tokens_schedule = "constant"
+
+    kwargs = dict(max_new_tokens=args.new_tokens, pad_token_id=tokenizer.eos_token_id, do_sample=args.sample)
+    if args.sample:
+        kwargs["temperature"] = 0.7
+
+    def run(enc, assistant):
+        extra = {"assistant_model": draft} if assistant else {}
+        with torch.no_grad():
+            return model.generate(**enc, **kwargs, **extra)
+
+    encoded = [tokenizer(prompt, return_tensors="pt") for prompt in prompts]
+    for enc in encoded[:2]:  # warm-up
+        run(enc, False)
+        run(enc, True)
+
+    stats = SpeculativeStats(model, draft)
+    baseline_s = speculative_s = 0.0
+    exact = 0
+    for enc in encoded:
+        for _ in range(args.repeats):
+            passes = stats.target_passes
+            torch.manual_seed(0)
+            t = time.perf_counter()
+            baseline = run(enc, False)
+            baseline_s += time.perf_counter() - t
+            stats.target_passes = passes  # the hook also saw the plain run; keep assisted passes only
+
+            torch.manual_seed(0)
+            t = time.perf_counter()
+            speculative = run(enc, True)
+            speculative_s += time.perf_counter() - t
+            stats.record(speculative.shape[1] - enc["input_ids"].shape[1])
+            exact += torch.equal(baseline, speculative)
+    stats.remove()
+
+    runs = len(prompts) * args.repeats
+    s = stats.stats()
+    mode = "sampling" if args.sample else "greedy"
+    print(f"{args.model} + draft {args.draft}, {mode}, {len(prompts)} prompts x {args.repeats}, "
+          f"{args.new_tokens} new tokens")
+    print(f"  acceptance rate   {s['acceptance_rate']:6.1%}  ({s['accepted']} of {s['draft_tokens']} drafted tokens)")
+    print(f"  tokens per pass   {s['tokens_per_pass']:6.2f}  (1.00 without a draft)")
+    print(f"  latency           {baseline_s / runs * 1000:7.1f} ms -> {speculative_s / runs * 1000:7.1f} ms  "
+          f"speedup {baseline_s / speculative_s:4.2f}x")
+    if not args.sample:
+        print(f"  identical to plain greedy: {exact}/{runs}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rag_utils.local_index import LocalIndex
+from rag_utils.upsert import ConcurrentUpserter
+
+
+def make_vectors(n, dim, files, seed=0):
+    rng = random.Random(seed)
+    vectors = []
+    for i in range(n):
+        text = " ".join(rng.choice(["alpha", "beta", "gamma", "delta"]) for _ in range(80))
+        values = [rng.uniform(-1, 1) for _ in range(dim)]
+        vectors.append((f"chunk-{i}", values, {"text": text, "source": f"file-{i % files}.pdf"}))
+    return vectors
+
+
+def per_file_serial(index, vectors, files):
+    # What the app did before: one upsert per file with every chunk of that file
+    t0 = time.perf_counter()
+    for f in range(files):
+        index.upsert(vectors=[v for v in vectors if v[2]["source"] == f"file-{f}.pdf"])
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upsert batching benchmark against LocalIndex")
+    parser.add_argument("--vectors", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=30.0,
+                        help="simulated round trip per request")
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.vectors, args.dim, args.files)
+    print(f"{args.vectors} vectors, dim {args.dim}, {args.latency_ms:.0f} ms per request")
+
+    index = LocalIndex(args.dim, latency_ms=args.latency_ms)
+    seconds = per_file_serial(index, vectors, args.files)
+    print(f"{'per-file serial':<24} {index.requests:>5} requests {seconds:>7.2f}s "
+          f"{args.vectors / seconds:>9.0f} vectors/s")
+
+    for in_flight in (1, 4, 8, 16):
+        index = LocalIndex(args.dim, latency_ms=args.latency_ms)
+        upserter = ConcurrentUpserter(index, max_in_flight=in_flight)
+        stats = upserter.upsert(vectors)
+        upserter.close()
+        print(f"{'batched, in-flight=' + str(in_flight):<24} {stats['batches']:>5} requests "
+              f"{stats['seconds']:>7.2f}s {stats['vectors_per_sec']:>9.0f} vectors/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+QUEUE_DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition format."""
+
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+            else:
+                self.counts[-1] += 1
+            self.sum += value
+            self.count += 1
+
+    def render(self):
+        with self._lock:
+            lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), self.counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum {self.sum}")
+            lines.append(f"{self.name}_count {self.count}")
+        return "\n".join(lines)
+
+
+class _Request:
+    __slots__ = ("prompt", "max_length", "future", "enqueued")
+
+    def __init__(self, prompt, max_length):
+        self.prompt = prompt
+        self.max_length = max_length
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class BatchGenerator:
+    """Dynamic micro-batching in front of a causal LM's `generate`.
+
+    Requests arriving within `max_wait_ms` of the first one (up to
+    `max_batch_size`) are left-padded into one batch and generated together;
+    each caller gets only its own text back. `max_length` keeps the pipeline
+    meaning: prompt plus new tokens. With an `assistant_model`, requests
+    that end up alone in a batch use speculative decoding instead.
+
+    Prompts are checked in `submit`, so a bad one fails only its caller;
+    if a batch still fails, its requests are retried one at a time.
+    """
+
+    def __init__(self, model, tokenizer, max_batch_size=None, max_wait_ms=None, assistant_model=None,
+                 **generate_kwargs):
+        # Defaults come from GEN_MAX_BATCH_SIZE / GEN_MAX_WAIT_MS (read here, after load_dotenv)
+        if max_batch_size is None:
+            max_batch_size = int(os.getenv("GEN_MAX_BATCH_SIZE", "8"))
+        if max_wait_ms is None:
+            max_wait_ms = float(os.getenv("GEN_MAX_WAIT_MS", "10"))
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.generate_kwargs = generate_kwargs
+        self.assistant_model = assistant_model
+        # Decoder-only models must be padded on the left so generation continues the prompt
+        tokenizer.padding_side = "left"
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        # Longest sequence the model has position embeddings for (1024 for GPT-2)
+        self.max_positions = getattr(model.config, "max_position_embeddings", None) or tokenizer.model_max_length
+
+        self.batch_sizes = Histogram(
+            "generate_batch_size", "Requests per generate() call", BATCH_SIZE_BUCKETS
+        )
+        self.queue_depths = Histogram(
+            "generate_queue_depth", "Requests waiting when a batch was formed", QUEUE_DEPTH_BUCKETS
+        )
+        self.wait_seconds = 0.0
+        self._queue = queue.Queue()
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        # Threads do not survive a fork: with gunicorn's preload_app this object is built
+        # in the master, so each worker starts its own batching thread on first use
+        if self._pid != os.getpid():
+            with self._start_lock:
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                    threading.Thread(target=self._run, args=(self._queue,),
+                                     name="batch-generate", daemon=True).start()
+                    self._pid = os.getpid()
+
+    def check(self, prompt, max_length=50):
+        """Raise TypeError / ValueError for a prompt that cannot be generated from."""
+        if not isinstance(prompt, str):
+            raise TypeError(f"prompt must be a string, not {type(prompt).__name__}")
+        if not prompt.strip():
+            raise ValueError("prompt is empty")
+        if not isinstance(max_length, int) or max_length < 1:
+            raise ValueError(f"max_length must be a positive integer, not {max_length!r}")
+        prompt_len = len(self.tokenizer(prompt)["input_ids"])
+        if max(prompt_len + 1, max_length) > self.max_positions:
+            raise ValueError(
+                f"prompt of {prompt_len} tokens with max_length={max_length} does not fit "
+                f"in the model's {self.max_positions} positions"
+            )
+
+    def submit(self, prompt, max_length=50):
+        self.check(prompt, max_length)
+        self._ensure_worker()
+        request = _Request(prompt, max_length)
+        self._queue.put(request)
+        return request.future
+
+    def generate(self, prompt, max_length=50, timeout=None):
+        return self.submit(prompt, max_length).result(timeout)
+
+    def stream(self, prompt, include_prompt=False, **kwargs):
+        """Stream one prompt outside the batch (see `gen_utils.streaming`)."""
+        from gen_utils.streaming import stream_generate
+
+        self.check(prompt, kwargs.get("max_length", 1))
+        if self.assistant_model is not None:
+            kwargs.setdefault("assistant_model", self.assistant_model)
+        return stream_generate(self.model, self.tokenizer, prompt, include_prompt=include_prompt,
+                               **{**self.generate_kwargs, **kwargs})
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def _collect(self, requests):
+        batch = [requests.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, requests):
+        while True:
+            batch = self._collect(requests)
+            self.queue_depths.observe(requests.qsize() + len(batch))
+            self.batch_sizes.observe(len(batch))
+            now = time.perf_counter()
+            self.wait_seconds += sum(now - r.enqueued for r in batch)
+            try:
+                texts = self._generate([r.prompt for r in batch], [r.max_length for r in batch])
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0].future.set_exception(e)
+                else:
+                    self._run_each(batch)
+                continue
+            for r, text in zip(batch, texts):
+                r.future.set_result(text)
+
+    def _run_each(self, batch):
+        # Padding to the longest prompt can overflow where each request alone fits, and
+        # one bad request should not fail the others: retry them one at a time
+        for r in batch:
+            try:
+                r.future.set_result(self._generate([r.prompt], [r.max_length])[0])
+            except Exception as e:
+                r.future.set_exception(e)
+
+    def _generate(self, prompts, max_lengths):
+        import torch
+
+        enc = self.tokenizer(prompts, return_tensors="pt", padding=True)
+        prompt_lens = enc["attention_mask"].sum(dim=1).tolist()
+        # One generate for the whole batch, long enough for the largest budget
+        budgets = [max(1, m - n) for m, n in zip(max_lengths, prompt_lens)]
+        extra = {}
+        if self.assistant_model is not None and len(prompts) == 1:
+            # Assisted generation handles one sequence at a time, which is exactly when
+            # the queue is quiet and per-request latency is what matters
+            extra["assistant_model"] = self.assistant_model
+        with torch.no_grad():
+            out = self.model.generate(
+                **enc, max_new_tokens=max(budgets),
+                pad_token_id=self.tokenizer.pad_token_id, **self.generate_kwargs, **extra
+            )
+        new_tokens = out[:, enc["input_ids"].shape[1]:]
+        return [
+            prompt + self.tokenizer.decode(tokens[:budget], skip_special_tokens=True)
+            for prompt, tokens, budget in zip(prompts, new_tokens, budgets)
+        ]
+
+    def metrics(self):
+        """Prometheus text: queue depth gauge plus batch-size and queue-depth histograms."""
+        return "\n".join([
+            "# HELP generate_queue_depth_current Requests waiting right now",
+            "# TYPE generate_queue_depth_current gauge",
+            f"generate_queue_depth_current {self.queue_depth()}",
+            "# HELP generate_queue_wait_seconds_total Time requests spent waiting for a batch",
+            "# TYPE generate_queue_wait_seconds_total counter",
+            f"generate_queue_wait_seconds_total {self.wait_seconds}",
+            self.batch_sizes.render(),
+            self.queue_depths.render(),
+        ]) + "\n"
+
+
+def load_batch_generator(model_name="gpt2", **kwargs):
+    from gen_utils.model_host import load_model
+
+    model, tokenizer = load_model(model_name)
+    return BatchGenerator(model, tokenizer, **kwargs)
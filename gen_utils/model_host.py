@@ -0,0 +1,275 @@
+import argparse
+import os
+import stat
+import tempfile
+import threading
+from multiprocessing.connection import Client, Listener
+
+from gen_utils.batching import BatchGenerator
+from gen_utils.speculative import check_draft, draft_model_name
+from gen_utils.streaming import stream_generate
+
+SOCKET_NAME = "model.sock"
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def host_mode():
+    """MODEL_HOST: "local" (default) loads weights in this process, "socket" uses `ModelServer`."""
+    return os.getenv("MODEL_HOST", "local")
+
+
+def default_socket_path():
+    """$XDG_RUNTIME_DIR/gen_utils/model.sock, or a per-user directory under the temp dir."""
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "gen_utils", SOCKET_NAME)
+    return os.path.join(tempfile.gettempdir(), f"gen_utils-{os.getuid()}", SOCKET_NAME)
+
+
+def _socket_path(path=None):
+    return path or os.getenv("MODEL_SOCKET") or default_socket_path()
+
+
+def _private_dir(directory):
+    # The socket must never be reachable by other users, not even between bind and chmod:
+    # it lives in a directory only we can enter, checked rather than trusted if it exists
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(
+            f"{directory} must be a directory owned by this user with mode 0700; "
+            f"set MODEL_SOCKET to a path in a private directory"
+        )
+
+
+def _authkey(authkey=None):
+    # Messages are pickles, so whoever holds the key can run code in the host: no default
+    authkey = authkey or os.getenv("MODEL_HOST_AUTHKEY")
+    if not authkey:
+        raise RuntimeError(
+            "MODEL_HOST_AUTHKEY is not set; give the model host and its clients the same secret, "
+            "e.g. from python -c 'import secrets; print(secrets.token_hex(32))'"
+        )
+    return authkey.encode() if isinstance(authkey, str) else authkey
+
+
+def load_model(model_name="gpt2"):
+    """Model and tokenizer, loaded once per process and shared by every caller.
+
+    Loaded before a fork (gunicorn `preload_app`), the workers share the
+    weights copy-on-write: inference never writes to the tensors.
+    MODEL_PRECISION=int8 loads the dynamically quantized model instead.
+    """
+    with _models_lock:
+        if model_name not in _models:
+            from transformers import AutoTokenizer
+
+            from gen_utils.quantize import load_model as load_weights
+
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            _models[model_name] = (load_weights(model_name), tokenizer)
+        return _models[model_name]
+
+
+def load_draft_model(model):
+    """Draft model for speculative decoding (GEN_DRAFT_MODEL), or None when it is off."""
+    name = draft_model_name()
+    if name is None:
+        return None
+    draft = load_model(name)[0]
+    check_draft(model, draft)
+    return draft
+
+
+def get_generator(model_name="gpt2", **generate_kwargs):
+    """Batched `generate(prompt, max_length)` / `stream(...)`, in-process or over MODEL_SOCKET."""
+    if host_mode() == "socket":
+        return RemoteGenerator(model_name, generate_kwargs=generate_kwargs)
+    model, tokenizer = load_model(model_name)
+    return BatchGenerator(model, tokenizer, assistant_model=load_draft_model(model), **generate_kwargs)
+
+
+def load_text_generator(model_name="gpt2", **generate_kwargs):
+    """A text-generation pipeline, or a stand-in that forwards calls to the model host."""
+    if host_mode() == "socket":
+        return RemoteGenerator(model_name, generate_kwargs=generate_kwargs)
+    from transformers import pipeline
+
+    model, tokenizer = load_model(model_name)
+    generator = pipeline("text-generation", model=model, tokenizer=tokenizer, **generate_kwargs)
+    # Only the streamed path drafts: beam search and num_return_sequences > 1 cannot
+    generator.draft_model = load_draft_model(model)
+    return generator
+
+
+class ModelServer:
+    """One process holding the weights; web workers reach it over a Unix socket.
+
+    Every request is its own connection and handler thread. `generate`
+    requests from all clients share a `BatchGenerator`, so concurrent
+    workers are batched together as well.
+    """
+
+    def __init__(self, path=None, authkey=None):
+        self.path = _socket_path(path)
+        self.authkey = _authkey(authkey)
+        self._batchers = {}
+        self._pipelines = {}
+        self._lock = threading.Lock()
+
+    def _batcher(self, model_name, generate_kwargs):
+        key = (model_name, tuple(sorted(generate_kwargs.items())))
+        with self._lock:
+            if key not in self._batchers:
+                model, tokenizer = load_model(model_name)
+                self._batchers[key] = BatchGenerator(
+                    model, tokenizer, assistant_model=load_draft_model(model), **generate_kwargs
+                )
+            return self._batchers[key]
+
+    def _pipeline(self, model_name):
+        with self._lock:
+            if model_name not in self._pipelines:
+                from transformers import pipeline
+
+                model, tokenizer = load_model(model_name)
+                self._pipelines[model_name] = pipeline("text-generation", model=model, tokenizer=tokenizer)
+            return self._pipelines[model_name]
+
+    def _handle(self, conn):
+        with conn:
+            try:
+                op, model_name, kwargs = conn.recv()
+                if op == "generate":
+                    batcher = self._batcher(model_name, kwargs.pop("generate_kwargs"))
+                    conn.send(("ok", batcher.generate(**kwargs)))
+                elif op == "call":
+                    conn.send(("ok", self._pipeline(model_name)(kwargs.pop("prompt"), **kwargs)))
+                elif op == "stream":
+                    model, tokenizer = load_model(model_name)
+                    draft = load_draft_model(model)
+                    if draft is not None:
+                        kwargs.setdefault("assistant_model", draft)
+                    for piece in stream_generate(model, tokenizer, **kwargs):
+                        conn.send(("piece", piece))
+                    conn.send(("end", None))
+                elif op == "metrics":
+                    conn.send(("ok", self._batcher(model_name, kwargs["generate_kwargs"]).metrics()))
+                elif op == "ping":
+                    conn.send(("ok", os.getpid()))
+                else:
+                    raise ValueError(f"unknown op {op!r}")
+            except (EOFError, OSError):
+                return  # client went away
+            except (TypeError, ValueError) as e:
+                # A bad request rather than a broken host; the client raises ValueError
+                try:
+                    conn.send(("invalid", str(e)))
+                except OSError:
+                    pass
+            except Exception as e:
+                try:
+                    conn.send(("error", f"{type(e).__name__}: {e}"))
+                except OSError:
+                    pass
+
+    def serve_forever(self, preload=()):
+        for model_name in preload:
+            load_model(model_name)
+        _private_dir(os.path.dirname(os.path.abspath(self.path)))
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        umask = os.umask(0o177)  # created 0600 by bind itself
+        try:
+            listener = Listener(self.path, family="AF_UNIX", authkey=self.authkey)
+        finally:
+            os.umask(umask)
+        with listener:
+            print(f"Model host pid {os.getpid()} listening on {self.path}", flush=True)
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception:
+                    continue  # failed handshake; keep serving the others
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+
+class RemoteGenerator:
+    """Client for `ModelServer`, usable where a `BatchGenerator` or a pipeline is expected.
+
+    Nothing heavy is imported here; only `tokenizer` loads anything, and
+    only the tokenizer.
+    """
+
+    def __init__(self, model_name="gpt2", path=None, authkey=None, generate_kwargs=None):
+        self.model_name = model_name
+        self.path = _socket_path(path)
+        self.authkey = _authkey(authkey)
+        self.generate_kwargs = generate_kwargs or {}
+        self._tokenizer = None
+
+    def _connect(self):
+        return Client(self.path, family="AF_UNIX", authkey=self.authkey)
+
+    def _request(self, op, timeout=None, **kwargs):
+        with self._connect() as conn:
+            conn.send((op, self.model_name, kwargs))
+            if timeout is not None and not conn.poll(timeout):
+                raise TimeoutError(f"model host did not answer within {timeout}s")
+            status, value = conn.recv()
+        if status == "invalid":
+            raise ValueError(value)
+        if status == "error":
+            raise RuntimeError(value)
+        return value
+
+    def generate(self, prompt, max_length=50, timeout=None):
+        return self._request(
+            "generate", timeout=timeout, prompt=prompt, max_length=max_length,
+            generate_kwargs=self.generate_kwargs
+        )
+
+    def __call__(self, prompt, **kwargs):
+        return self._request("call", prompt=prompt, **{**self.generate_kwargs, **kwargs})
+
+    def stream(self, prompt, **kwargs):
+        with self._connect() as conn:
+            conn.send(("stream", self.model_name, dict(prompt=prompt, **{**self.generate_kwargs, **kwargs})))
+            while True:
+                status, value = conn.recv()
+                if status == "end":
+                    return
+                if status == "invalid":
+                    raise ValueError(value)
+                if status == "error":
+                    raise RuntimeError(value)
+                yield value
+
+    def metrics(self):
+        return self._request("metrics", generate_kwargs=self.generate_kwargs)
+
+    def ping(self):
+        return self._request("ping")
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            from transformers import AutoTokenizer
+
+            self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        return self._tokenizer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve text-generation models over a Unix socket")
+    parser.add_argument("--model", action="append", default=None,
+                        help="model to load at startup (repeatable, default gpt2)")
+    parser.add_argument("--socket", default=None, help=f"socket path (default MODEL_SOCKET or {default_socket_path()})")
+    args = parser.parse_args()
+    ModelServer(args.socket).serve_forever(preload=args.model or ["gpt2"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import os
+import threading
+
+DEFAULT_QUANT_DIR = os.getenv(
+    "QUANT_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "gen_utils", "quantized")
+)
+
+_TASK_MODELS = {
+    "text-generation": "AutoModelForCausalLM",
+    "sentiment-analysis": "AutoModelForSequenceClassification",
+    "text-classification": "AutoModelForSequenceClassification",
+}
+
+
+def model_precision():
+    """MODEL_PRECISION: "fp32" (default) or "int8" (dynamic quantization, CPU only)."""
+    return os.getenv("MODEL_PRECISION", "fp32").lower()
+
+
+def conv1d_to_linear(model):
+    """Swap GPT-2's `Conv1D` projections for equivalent `nn.Linear` layers, in place.
+
+    `Conv1D` is a Linear with a transposed weight; `quantize_dynamic` only
+    knows `nn.Linear`, so without this only `lm_head` would be quantized.
+    """
+    import torch
+    from transformers.pytorch_utils import Conv1D
+
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if isinstance(child, Conv1D):
+                n_in, n_out = child.weight.shape
+                linear = torch.nn.Linear(n_in, n_out)
+                with torch.no_grad():
+                    linear.weight.copy_(child.weight.t())
+                    linear.bias.copy_(child.bias)
+                setattr(parent, name, linear)
+    return model
+
+
+def quantize_int8(model):
+    """int8 weights for every Linear layer; activations are quantized on the fly."""
+    import torch
+
+    model = conv1d_to_linear(model.eval())
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _cache_path(model_name, auto_class, cache_dir):
+    import torch
+    import transformers
+
+    # Packed int8 weights are tied to the torch build and the module layout
+    safe_name = model_name.replace("/", "__")
+    tag = f"{auto_class}-torch{torch.__version__}-tf{transformers.__version__}".replace("+", "_")
+    return os.path.join(cache_dir, f"{safe_name}.{tag}.int8.pt")
+
+
+def load_quantized(model_name, auto_class="AutoModelForCausalLM", cache_dir=DEFAULT_QUANT_DIR):
+    """int8 model, quantized once and then loaded from `cache_dir`.
+
+    On a hit only the config is read: the fp32 skeleton is built from it,
+    quantized (so the module types match) and the cached weights loaded in.
+    """
+    import torch
+    import transformers
+
+    cls = getattr(transformers, auto_class)
+    path = _cache_path(model_name, auto_class, cache_dir)
+    if os.path.exists(path):
+        config = transformers.AutoConfig.from_pretrained(model_name)
+        model = quantize_int8(cls.from_config(config))
+        # Written by `load_quantized` below; packed params need the full unpickler
+        model.load_state_dict(torch.load(path, map_location="cpu", weights_only=False))
+        return model.eval()
+
+    model = quantize_int8(cls.from_pretrained(model_name))
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    torch.save(model.state_dict(), tmp_path)
+    os.replace(tmp_path, path)
+    return model
+
+
+def load_model(model_name, auto_class="AutoModelForCausalLM", precision=None):
+    """fp32 model, or the cached int8 one when MODEL_PRECISION=int8."""
+    precision = precision or model_precision()
+    if precision == "int8":
+        return load_quantized(model_name, auto_class)
+    if precision != "fp32":
+        raise ValueError(f"MODEL_PRECISION must be fp32 or int8, not {precision!r}")
+    import transformers
+
+    return getattr(transformers, auto_class).from_pretrained(model_name).eval()
+
+
+def load_pipeline(task, model_name, precision=None, **kwargs):
+    """`transformers.pipeline(task, model_name)` honouring MODEL_PRECISION."""
+    from transformers import AutoTokenizer, pipeline
+
+    model = load_model(model_name, _TASK_MODELS[task], precision)
+    return pipeline(task, model=model, tokenizer=AutoTokenizer.from_pretrained(model_name), **kwargs)
@@ -0,0 +1,67 @@
+import os
+
+
+def draft_model_name():
+    """GEN_DRAFT_MODEL (e.g. "distilgpt2"); unset or empty turns speculative decoding off."""
+    return os.getenv("GEN_DRAFT_MODEL") or None
+
+
+def check_draft(model, draft):
+    # The target verifies the draft's token ids directly, so both need the same vocabulary
+    if model.config.vocab_size != draft.config.vocab_size:
+        raise ValueError(
+            f"draft vocabulary ({draft.config.vocab_size}) does not match "
+            f"the target's ({model.config.vocab_size})"
+        )
+
+
+class SpeculativeStats:
+    """Acceptance and tokens per target pass, counted from forward-pass hooks.
+
+    In assisted generation every target pass verifies the pending draft
+    tokens and adds one token of its own, so accepted = new - target passes;
+    each draft pass proposes one token.
+    """
+
+    def __init__(self, model, draft):
+        self.target_passes = 0
+        self.draft_passes = 0
+        self.new_tokens = 0
+        self._hooks = [
+            model.register_forward_hook(self._count_target),
+            draft.register_forward_hook(self._count_draft),
+        ]
+
+    def _count_target(self, module, args, output):
+        self.target_passes += 1
+
+    def _count_draft(self, module, args, output):
+        self.draft_passes += 1
+
+    def record(self, new_tokens):
+        self.new_tokens += new_tokens
+
+    def remove(self):
+        for hook in self._hooks:
+            hook.remove()
+        self._hooks = []
+
+    @property
+    def accepted(self):
+        return max(0, self.new_tokens - self.target_passes)
+
+    def acceptance_rate(self):
+        return self.accepted / self.draft_passes if self.draft_passes else 0.0
+
+    def tokens_per_pass(self):
+        return self.new_tokens / self.target_passes if self.target_passes else 0.0
+
+    def stats(self):
+        return {
+            "new_tokens": self.new_tokens,
+            "target_passes": self.target_passes,
+            "draft_tokens": self.draft_passes,
+            "accepted": self.accepted,
+            "acceptance_rate": self.acceptance_rate(),
+            "tokens_per_pass": self.tokens_per_pass(),
+        }
@@ -0,0 +1,73 @@
+import json
+import threading
+
+
+def stream_generate(model, tokenizer, prompt, include_prompt=False, timeout=120.0, **generate_kwargs):
+    """Yield text pieces as `model.generate` produces them.
+
+    Generation runs on a background thread feeding a `TextIteratorStreamer`,
+    so the first piece arrives after the first token rather than the last.
+    With include_prompt=True the prompt is yielded first, matching the
+    pipeline's `generated_text`. Beam search cannot stream.
+    """
+    from transformers import TextIteratorStreamer
+
+    inputs = tokenizer(prompt, return_tensors="pt")
+    streamer = TextIteratorStreamer(
+        tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=timeout
+    )
+    generate_kwargs.setdefault("pad_token_id", tokenizer.eos_token_id)
+    errors = []
+
+    def run():
+        try:
+            model.generate(**inputs, streamer=streamer, **generate_kwargs)
+        except BaseException as e:
+            errors.append(e)
+            streamer.end()
+
+    thread = threading.Thread(target=run, name="stream-generate", daemon=True)
+    thread.start()
+    if include_prompt:
+        yield prompt
+    for text in streamer:
+        if text:
+            yield text
+    thread.join()
+    if errors:
+        raise errors[0]
+
+
+def stream_pipeline(generator, prompt, **kwargs):
+    """`stream_generate` with the model and tokenizer of a text-generation pipeline.
+
+    Generators with their own `stream` (the model host client) stream themselves;
+    a `draft_model` set by `model_host.load_text_generator` turns on speculative decoding.
+    """
+    if hasattr(generator, "stream"):
+        return generator.stream(prompt, **kwargs)
+    draft = getattr(generator, "draft_model", None)
+    if draft is not None:
+        kwargs.setdefault("assistant_model", draft)
+    return stream_generate(generator.model, generator.tokenizer, prompt, **kwargs)
+
+
+def on_complete(pieces, callback):
+    """Pass pieces through and call callback(full_text) once the stream is exhausted."""
+    parts = []
+    for piece in pieces:
+        parts.append(piece)
+        yield piece
+    callback("".join(parts))
+
+
+def to_sse(pieces, done=None):
+    """Server-Sent Events: one `data: {"token": ...}` event per piece, then `event: done`."""
+    try:
+        for piece in pieces:
+            yield f"data: {json.dumps({'token': piece})}\n\n"
+    except Exception as e:
+        # Headers are already sent, so the failure goes to the client as an event
+        yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        return
+    yield f"event: done\ndata: {json.dumps(done or {})}\n\n"
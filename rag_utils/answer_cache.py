@@ -0,0 +1,90 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """Generated answers keyed by question embedding and retrieved context.
+
+    A lookup hits when the nearest cached question has cosine similarity of at
+    least `threshold` and was answered from the same context ids, so a
+    paraphrase reuses the answer while a re-indexed corpus does not.
+    Least recently used entries are evicted past `maxsize`.
+    """
+
+    def __init__(self, threshold=0.92, maxsize=512):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.saved_seconds = 0.0
+        self._entries = OrderedDict()
+        self._next_key = 0
+        self._matrix = None
+        self._keys = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _nearest(self, vector):
+        if not self._entries:
+            return None, 0.0
+        if self._matrix is None:
+            self._keys = list(self._entries)
+            self._matrix = np.stack([self._entries[k]["vector"] for k in self._keys])
+        scores = self._matrix @ vector
+        best = int(np.argmax(scores))
+        return self._keys[best], float(scores[best])
+
+    def lookup(self, vector, context_ids):
+        """Cached answer for this question and context, or None."""
+        vector = self._normalize(vector)
+        with self._lock:
+            key, score = self._nearest(vector)
+            if key is None or score < self.threshold:
+                self.misses += 1
+                return None
+            entry = self._entries[key]
+            if entry["context_ids"] != tuple(sorted(context_ids)):
+                # Same question, but retrieval changed since it was answered
+                self.stale += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry["seconds"]
+            return entry["answer"]
+
+    def store(self, vector, context_ids, answer, seconds=0.0):
+        """Remember an answer; `seconds` is what generating it cost."""
+        vector = self._normalize(vector)
+        with self._lock:
+            key, score = self._nearest(vector)
+            if key is None or score < self.threshold:
+                key = self._next_key
+                self._next_key += 1
+            # A near-duplicate question (e.g. with stale context) is replaced in place
+            self._entries[key] = {
+                "vector": vector, "context_ids": tuple(sorted(context_ids)),
+                "answer": answer, "seconds": seconds
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_rate": self.hits / total if total else 0.0,
+            "saved_seconds": self.saved_seconds
+        }
@@ -0,0 +1,132 @@
+import re
+
+# Sentence end: ., ! or ? (optionally closed by quotes/brackets) followed by whitespace
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s")
+_NON_SPACE = re.compile(r"\S")
+
+# MiniLM-L6-v2 truncates at 256 tokens, two of which are [CLS] / [SEP]
+MINILM_MAX_TOKENS = 254
+
+# Bump whenever chunk boundaries change; cached chunk offsets are keyed on it
+CHUNKER_VERSION = 1
+
+
+def _snap(text, start, end, lookback):
+    # Prefer a paragraph break, then a sentence end, then whitespace, searched
+    # only in the last `lookback` chars of the window (no string copies)
+    lo = max(start + 1, end - lookback)
+    cut = text.rfind("\n\n", lo, end)
+    if cut != -1:
+        return cut + 2
+    last = None
+    for last in _SENTENCE_END.finditer(text, lo, end):
+        pass
+    if last is not None:
+        return last.end()
+    cut = max(text.rfind(" ", lo, end), text.rfind("\n", lo, end))
+    if cut != -1:
+        return cut + 1
+    return end
+
+
+def _iter_spans(text, chunk_size, overlap, min_chars, snap, final):
+    """Yield (start, end, next_start) windows over `text`.
+
+    With final=False it stops before the window that would touch the end of
+    `text`, so a streaming caller can append more text and resume from the
+    last next_start.
+    """
+    if overlap >= chunk_size:
+        raise ValueError("overlap must be smaller than chunk_size")
+    n = len(text)
+    lookback = chunk_size // 4
+    start = 0
+    while start < n:
+        end = start + chunk_size
+        # A tail shorter than min_chars is merged into this chunk, not dropped
+        if end + min_chars >= n:
+            if not final:
+                return
+            end = n
+        elif snap:
+            end = _snap(text, start, end, lookback)
+
+        next_start = end if end == n else max(end - overlap, start + 1)
+        if _NON_SPACE.search(text, start, end):
+            yield start, end, next_start
+        if end == n:
+            return
+        start = next_start
+
+
+def chunk_spans(text, chunk_size=500, overlap=50, min_chars=50, snap=True):
+    """(start, end) character offsets of each chunk; no substrings are created."""
+    for start, end, _ in _iter_spans(text, chunk_size, overlap, min_chars, snap, final=True):
+        yield start, end
+
+
+def token_spans(text, tokenizer, max_tokens=MINILM_MAX_TOKENS, overlap_tokens=32, snap=True):
+    """(start, end) character offsets of windows holding at most `max_tokens` tokens.
+
+    `tokenizer` must be a fast Hugging Face tokenizer (e.g. `model.tokenizer`
+    of the MiniLM SentenceTransformer) so offset mappings are available.
+    """
+    offsets = tokenizer(
+        text, add_special_tokens=False, return_offsets_mapping=True
+    )["offset_mapping"]
+    n = len(offsets)
+    i = 0
+    while i < n:
+        j = min(i + max_tokens, n)
+        if j < n and snap:
+            # Cut after the last sentence-ending token in the final quarter
+            for k in range(j, i + (3 * max_tokens) // 4, -1):
+                if text[offsets[k - 1][1] - 1] in ".!?":
+                    j = k
+                    break
+        yield offsets[i][0], offsets[j - 1][1]
+        if j == n:
+            return
+        i = max(j - overlap_tokens, i + 1)
+
+
+def materialize(text, spans):
+    # Strings are only created here, right before they are embedded
+    for start, end in spans:
+        yield text[start:end]
+
+
+def chunk_text(text, chunk_size=500, overlap=50, min_chars=50, snap=True):
+    return list(materialize(text, chunk_spans(text, chunk_size, overlap, min_chars, snap)))
+
+
+def iter_text_spans(pieces, chunk_size=500, overlap=50, min_chars=50, snap=True):
+    """Streaming chunker yielding (start, end, chunk).
+
+    Offsets index the pieces joined with "\n" (leading empty pieces dropped),
+    so they match `chunk_spans` over that text.
+    """
+    buffer = ""
+    base = 0
+    for piece in pieces:
+        buffer = piece if not buffer else buffer + "\n" + piece
+        resume = 0
+        for start, end, next_start in _iter_spans(
+            buffer, chunk_size, overlap, min_chars, snap, final=False
+        ):
+            yield base + start, base + end, buffer[start:end]
+            resume = next_start
+        if resume:
+            buffer = buffer[resume:]
+            base += resume
+    for start, end, _ in _iter_spans(buffer, chunk_size, overlap, min_chars, snap, final=True):
+        yield base + start, base + end, buffer[start:end]
+
+
+def iter_text_chunks(pieces, chunk_size=500, overlap=50, min_chars=50, snap=True):
+    """Streaming chunker over an iterable of text pieces (pages, paragraphs).
+
+    Only the current piece plus one unfinished window is held in memory.
+    """
+    for _, _, chunk in iter_text_spans(pieces, chunk_size, overlap, min_chars, snap):
+        yield chunk
@@ -0,0 +1,151 @@
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from rag_utils.local_index import LocalIndex
+
+# One background thread folds old turns into summaries for every session
+_summary_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_summary_pool():
+    global _summary_pool
+    with _pool_lock:
+        if _summary_pool is None:
+            _summary_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary")
+        return _summary_pool
+
+
+def count_words(text):
+    # Rough token count when no tokenizer is given (GPT-2 averages ~1.3 tokens per word)
+    return int(len(text.split()) * 1.3) + 1
+
+
+def extractive_summary(summary, turns, count_tokens=count_words, max_tokens=128):
+    """Running summary: first sentence of each folded turn, oldest dropped past max_tokens."""
+    lines = summary.splitlines() if summary else []
+    for turn in turns:
+        first = re.split(r"(?<=[.!?])\s", turn["content"].strip(), maxsplit=1)[0]
+        lines.append(f"{turn['role']}: {first[:200]}")
+    while len(lines) > 1 and count_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def format_turn(turn):
+    return f"{turn['role']}: {turn['content']}"
+
+
+class ConversationMemory:
+    """Token-budgeted chat memory: recent turns, a running summary, vector recall.
+
+    The last `recent_turns` turns are kept verbatim. Older turns are folded
+    into `summary` on a background thread (off the request path) and, when an
+    `embed` function is given, stored as vectors so `context()` can recall the
+    ones relevant to the current question. `context()` never exceeds
+    `token_budget` tokens, so prompt size stays flat as the chat grows.
+    """
+
+    def __init__(self, recent_turns=6, token_budget=512, count_tokens=count_words,
+                 embed=None, summarize=extractive_summary, summary_tokens=128, recall_k=2):
+        self.recent_turns = recent_turns
+        self.token_budget = token_budget
+        self.count_tokens = count_tokens
+        self.embed = embed
+        self.summarize = summarize
+        self.summary_tokens = summary_tokens
+        self.recall_k = recall_k
+        self.recent = []
+        self.summary = ""
+        self.archived = 0
+        self._long_term = None
+        self._turns = {}
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def add(self, role, content):
+        with self._lock:
+            self.recent.append({"role": role, "content": content})
+            overflow = self.recent[:-self.recent_turns] if len(self.recent) > self.recent_turns else []
+            self.recent = self.recent[len(overflow):]
+            if overflow:
+                self._pending = _get_summary_pool().submit(self._archive, overflow)
+
+    def _archive(self, turns):
+        # Runs on the summary thread
+        summary = self.summarize(self.summary, turns, self.count_tokens, self.summary_tokens)
+        vectors = self.embed([t["content"] for t in turns]) if self.embed else None
+        with self._lock:
+            self.summary = summary
+            if vectors is not None:
+                if self._long_term is None:
+                    self._long_term = LocalIndex(dimension=len(vectors[0]))
+                items = []
+                for turn, vector in zip(turns, vectors):
+                    turn_id = str(self.archived)
+                    self._turns[turn_id] = turn
+                    items.append((turn_id, vector))
+                    self.archived += 1
+                self._long_term.upsert(items)
+            else:
+                self.archived += len(turns)
+
+    def wait(self):
+        """Block until background summarisation has caught up (tests, shutdown)."""
+        pending = self._pending
+        if pending is not None:
+            pending.result()
+
+    def recall(self, query_vector, k=None):
+        """Archived turns most similar to `query_vector`."""
+        with self._lock:
+            if self._long_term is None or not len(self._long_term):
+                return []
+            matches = self._long_term.query_batch([query_vector], top_k=k or self.recall_k)[0]
+            return [self._turns[m["id"]] for m in matches]
+
+    def context(self, query_vector=None, budget=None):
+        """History text for the next prompt, within `budget` tokens.
+
+        Priority: newest recent turns, then recalled turns, then the summary.
+        """
+        budget = self.token_budget if budget is None else budget
+        with self._lock:
+            recent = list(self.recent)
+            summary = self.summary
+        recalled = self.recall(query_vector) if query_vector is not None else []
+
+        used = 0
+        kept_recent = []
+        for turn in reversed(recent):
+            cost = self.count_tokens(format_turn(turn))
+            if used + cost > budget:
+                break
+            kept_recent.insert(0, turn)
+            used += cost
+
+        kept_recalled = []
+        for turn in recalled:
+            cost = self.count_tokens(format_turn(turn))
+            if used + cost <= budget:
+                kept_recalled.append(turn)
+                used += cost
+
+        parts = []
+        if summary and used + self.count_tokens(summary) <= budget:
+            parts.append(f"Summary of earlier conversation:\n{summary}")
+        if kept_recalled:
+            parts.append("Relevant earlier turns:\n" + "\n".join(map(format_turn, kept_recalled)))
+        if kept_recent:
+            parts.append("\n".join(map(format_turn, kept_recent)))
+        return "\n\n".join(parts)
+
+    def clear(self):
+        self.wait()
+        with self._lock:
+            self.recent = []
+            self.summary = ""
+            self.archived = 0
+            self._long_term = None
+            self._turns = {}
@@ -0,0 +1,179 @@
+import hashlib
+import os
+import threading
+from itertools import dropwhile
+
+import numpy as np
+import pypdf
+
+from rag_utils.chunker import CHUNKER_VERSION, chunk_spans, iter_text_spans, materialize
+from rag_utils.parallel_parse import parse_files
+from rag_utils.readers import PARSER_VERSION
+
+DEFAULT_DOC_CACHE_DIR = os.getenv(
+    "DOC_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "rag_utils", "documents")
+)
+DEFAULT_MAX_BYTES = int(os.getenv("DOC_CACHE_MAX_MB", "1024")) * 1024 * 1024
+
+# pypdf upgrades can change extracted text, so its version is part of the key
+_PARSER_TAG = f"p{PARSER_VERSION}-pypdf{pypdf.__version__}"
+
+
+def _file_bytes(file):
+    return file.getvalue() if hasattr(file, "getvalue") else file.read()
+
+
+class DocumentCache:
+    """Extracted text and chunk offsets on disk, keyed by the file's content hash.
+
+    Text is stored once per (content, parser version); offsets once per chunker
+    version and chunking parameters, so chunks are rebuilt by slicing the text.
+    Files are shared by every process using the same directory; least recently
+    read entries are evicted once the directory grows past `max_bytes`.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_DOC_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, data):
+        return f"{hashlib.sha256(data).hexdigest()}-{_PARSER_TAG}"
+
+    def _path(self, name):
+        return os.path.join(self.cache_dir, name)
+
+    @staticmethod
+    def _spans_name(key, chunk_size, overlap, min_chars, snap):
+        return f"{key}.c{CHUNKER_VERSION}-{chunk_size}-{overlap}-{min_chars}-{int(snap)}.npy"
+
+    def _read(self, name, loader):
+        path = self._path(name)
+        try:
+            value = loader(path)
+        except (FileNotFoundError, ValueError):
+            return None
+        try:
+            os.utime(path)  # mtime doubles as last access for eviction
+        except FileNotFoundError:
+            pass
+        return value
+
+    def _write(self, name, writer):
+        path = self._path(name)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        writer(tmp_path)
+        os.replace(tmp_path, path)
+
+    def has(self, key):
+        return os.path.exists(self._path(f"{key}.txt"))
+
+    def text(self, key):
+        def load(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+        return self._read(f"{key}.txt", load)
+
+    def spans(self, key, chunk_size=500, overlap=50, min_chars=50, snap=True):
+        return self._read(self._spans_name(key, chunk_size, overlap, min_chars, snap), np.load)
+
+    def put(self, key, text, spans, chunk_size=500, overlap=50, min_chars=50, snap=True):
+        def write_text(path):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+
+        def write_spans(path):
+            with open(path, "wb") as f:
+                np.save(f, np.asarray(spans, dtype=np.int64).reshape(-1, 2))
+
+        self._write(f"{key}.txt", write_text)
+        self._write(self._spans_name(key, chunk_size, overlap, min_chars, snap), write_spans)
+        self.evict()
+
+    def evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def chunks(self, key, pieces, chunk_size=500, overlap=50, min_chars=50, snap=True):
+        """Chunks of a document, from the cache or by chunking `pieces()` as it streams.
+
+        `pieces` is only called on a miss; the text and offsets are stored once
+        the stream has been consumed.
+        """
+        params = (chunk_size, overlap, min_chars, snap)
+        text = self.text(key)
+        if text is not None:
+            spans = self.spans(key, *params)
+            if spans is None:
+                spans = list(chunk_spans(text, *params))
+                self.put(key, text, spans, *params)
+            self.hits += 1
+            yield from materialize(text, spans)
+            return
+
+        self.misses += 1
+        seen, spans = [], []
+        for start, end, chunk in iter_text_spans(_collect(pieces(), seen), *params):
+            spans.append((start, end))
+            yield chunk
+        self.put(key, "\n".join(dropwhile(lambda p: not p, seen)), spans, *params)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0}
+
+
+def _collect(pieces, into):
+    for piece in pieces:
+        into.append(piece)
+        yield piece
+
+
+def _parse_one(file, executor, timings):
+    pieces = []
+    for _, file_pieces in parse_files([file], executor, timings=timings):
+        pieces.extend(file_pieces)
+    return pieces
+
+
+def parse_chunks(files, executor, cache, timings=None, **chunk_kwargs):
+    """`parse_files` + chunking, serving documents seen before from `cache`.
+
+    Yields (file, chunks) in upload order; only cache misses are sent to the
+    parse pool.
+    """
+    files = list(files)
+    keys = [cache.key(_file_bytes(file)) for file in files]
+    cached = [cache.has(key) for key in keys]
+    parsed = parse_files(
+        [file for file, hit in zip(files, cached) if not hit], executor, timings=timings
+    )
+    for file, key, hit in zip(files, keys, cached):
+        if hit:
+            # Parses after all if the entry was evicted in the meantime. The generator is
+            # exhausted before returning: closing it early removes its spooled PDF while
+            # page ranges may still be pending
+            fallback = lambda file=file: _parse_one(file, executor, timings)
+            yield file, cache.chunks(key, fallback, **chunk_kwargs)
+        else:
+            _, pieces = next(parsed)
+            yield file, cache.chunks(key, lambda pieces=pieces: pieces, **chunk_kwargs)
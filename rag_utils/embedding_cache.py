@@ -0,0 +1,353 @@
+import hashlib
+import json
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: the cache is then only safe within one process
+    fcntl = None
+
+DEFAULT_CACHE_DIR = os.getenv(
+    "EMBEDDING_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "rag_utils", "embeddings")
+)
+# "torch" (SentenceTransformer) or "onnx-int8" / "onnx" (ONNX Runtime on CPU)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+
+# keys.log record: sha256 key digest + row
+_KEY_RECORD = struct.Struct("<32sI")
+# rows.bin entry per row: key digest + crc32 of the stored vector
+_STAMP = struct.Struct("<32sI")
+_COMPACT_FACTOR = 4
+
+
+def _stamp(key, vector):
+    return _STAMP.pack(bytes.fromhex(key), zlib.crc32(vector.tobytes()))
+
+
+def text_key(model_name, text, normalize=False):
+    # Key = model + normalisation flag + text, so two models never share rows
+    h = hashlib.sha256()
+    h.update(model_name.encode("utf-8"))
+    h.update(b"\0n" if normalize else b"\0r")
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+class EmbeddingCache:
+    """On-disk embedding store: a memory-mapped float32 matrix plus an append-only key log.
+
+    Several processes can share one directory. Rows are handed out under an
+    exclusive `fcntl` lock after replaying the (key, row) records other
+    processes appended to `keys.log`, so a row is never given to two keys.
+    Every row also carries its key digest and a CRC of its vector
+    (`rows.bin`); `get_many` checks them, so a row reused elsewhere, or a
+    write a crash cut short, reads as a miss rather than another text's
+    vector. It replays the log at most once per batch of keys.
+
+    Rows are reused in least-recently-used order (per process) once
+    `max_entries` is reached. The log is rewritten from the live mapping once
+    it holds `_COMPACT_FACTOR` times more records than rows. `dim` and
+    `max_entries` are fixed when the directory is created.
+    """
+
+    def __init__(self, model_name, dim, cache_dir=DEFAULT_CACHE_DIR, max_entries=100_000):
+        self.model_name = model_name
+        self.dim = dim
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        safe_name = model_name.replace("/", "__")
+        self.path = os.path.join(cache_dir, safe_name)
+        os.makedirs(self.path, exist_ok=True)
+        self._matrix_path = os.path.join(self.path, "vectors.f32")
+        self._rows_path = os.path.join(self.path, "rows.bin")
+        self._meta_path = os.path.join(self.path, "meta.json")
+        self._log_path = os.path.join(self.path, "keys.log")
+        self._lock_path = os.path.join(self.path, "lock")
+        self._legacy_index_path = os.path.join(self.path, "index.json")
+
+        self._open()
+        self._reset()
+        self._sync()
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_meta(self):
+        if not os.path.exists(self._meta_path):
+            return None
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_meta(self):
+        # Written last when creating, so its presence means the files are complete
+        tmp_path = self._meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"model_name": self.model_name, "dim": self.dim,
+                       "max_entries": self.max_entries}, f)
+        os.replace(tmp_path, self._meta_path)
+
+    def _map(self, mode):
+        self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode=mode,
+                                 shape=(self.max_entries, self.dim))
+        self._rows = np.memmap(self._rows_path, dtype=np.uint8, mode=mode,
+                               shape=(self.max_entries, _STAMP.size))
+
+    def _open(self):
+        with self._file_lock():
+            meta = self._read_meta()
+            if meta is None and os.path.exists(self._legacy_index_path):
+                self._migrate_legacy_index()
+                meta = self._read_meta()
+            if meta is None:
+                self._map("w+")
+                if os.path.exists(self._log_path):
+                    os.remove(self._log_path)
+                self._write_meta()
+                return
+            if meta.get("dim") != self.dim or meta.get("max_entries") != self.max_entries:
+                # Other processes may be reading these files; never truncate them
+                raise ValueError(
+                    f"{self.path} holds a cache with dim={meta.get('dim')}, "
+                    f"max_entries={meta.get('max_entries')}; open it with the same values "
+                    f"or use another cache_dir"
+                )
+            self._map("r+")
+
+    def _migrate_legacy_index(self):
+        # Caches written before the key log kept one JSON index; carry its rows over
+        with open(self._legacy_index_path, "r", encoding="utf-8") as f:
+            legacy = json.load(f)
+        if legacy.get("dim") != self.dim or legacy.get("max_entries") != self.max_entries:
+            return  # shape differs: leave it, a fresh cache is created next to it
+        self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode="r+",
+                                 shape=(self.max_entries, self.dim))
+        self._rows = np.memmap(self._rows_path, dtype=np.uint8, mode="w+",
+                               shape=(self.max_entries, _STAMP.size))
+        records = []
+        for key, row in legacy["slots"]:
+            self._rows[row] = np.frombuffer(_stamp(key, np.array(self._matrix[row])), dtype=np.uint8)
+            records.append(_KEY_RECORD.pack(bytes.fromhex(key), row))
+        self._rows.flush()
+        with open(self._log_path, "wb") as f:
+            f.write(b"".join(records))
+        self._write_meta()
+        os.remove(self._legacy_index_path)
+
+    def _reset(self):
+        # key -> row, kept in LRU order (oldest first); row -> key as the log last assigned it
+        self._slots = OrderedDict()
+        self._owner = {}
+        self._free = set(range(self.max_entries))
+        self._log_inode = None
+        self._log_offset = 0
+
+    def _assign(self, key, row):
+        previous_key = self._owner.get(row)
+        if previous_key is not None and self._slots.get(previous_key) == row:
+            del self._slots[previous_key]
+        previous_row = self._slots.get(key)
+        if previous_row is not None and previous_row != row:
+            del self._owner[previous_row]
+            self._free.add(previous_row)
+        self._slots[key] = row
+        self._slots.move_to_end(key)
+        self._owner[row] = key
+        self._free.discard(row)
+
+    def _sync(self):
+        # Replay records other processes appended since we last looked; a new
+        # inode means the log was compacted, so start over from its beginning
+        try:
+            f = open(self._log_path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            info = os.fstat(f.fileno())
+            if info.st_ino != self._log_inode:
+                self._reset()
+                self._log_inode = info.st_ino
+            f.seek(self._log_offset)
+            data = f.read(info.st_size - self._log_offset)
+        usable = len(data) - len(data) % _KEY_RECORD.size  # a record still being written waits
+        for digest, row in _KEY_RECORD.iter_unpack(data[:usable]):
+            self._assign(digest.hex(), row)
+        self._log_offset += usable
+
+    def flush(self):
+        """Write dirty vector pages back to disk (the key log is appended as it goes)."""
+        self._matrix.flush()
+        self._rows.flush()
+
+    def _lookup(self, key):
+        # Caller holds self._lock
+        row = self._slots.get(key)
+        if row is None:
+            return None
+        vector = np.array(self._matrix[row])
+        if self._rows[row].tobytes() != _stamp(key, vector):
+            return None  # reused by another process since we last synced, or never fully written
+        self._slots.move_to_end(key)
+        return vector
+
+    def get(self, key):
+        return self.get_many([key])[0]
+
+    def get_many(self, keys):
+        """Vector (or None on a miss) per key, replaying other processes' writes at most once."""
+        with self._lock:
+            vectors = [self._lookup(key) for key in keys]
+            if any(vector is None for vector in vectors):
+                self._sync()  # another process may have added or reused them
+                vectors = [self._lookup(key) if vector is None else vector
+                           for key, vector in zip(keys, vectors)]
+            hits = sum(vector is not None for vector in vectors)
+            self.hits += hits
+            self.misses += len(vectors) - hits
+            return vectors
+
+    def put(self, key, vector):
+        self.put_many([(key, vector)])
+
+    def put_many(self, items):
+        with self._lock, self._file_lock():
+            self._sync()
+            records = []
+            for key, vector in items:
+                row = self._slots.get(key)
+                if row is None:
+                    row = self._free.pop() if self._free else next(iter(self._slots.values()))
+                vector = np.asarray(vector, dtype=np.float32).reshape(self.dim)
+                # Invalidate, write, then stamp: readers never accept a half-written row
+                self._rows[row] = 0
+                self._matrix[row] = vector
+                self._rows[row] = np.frombuffer(_stamp(key, vector), dtype=np.uint8)
+                self._assign(key, row)
+                records.append(_KEY_RECORD.pack(bytes.fromhex(key), row))
+            # Rows first, then the log: a record never points at a row not yet written
+            data = b"".join(records)
+            with open(self._log_path, "ab") as f:
+                f.write(data)
+                self._log_inode = os.fstat(f.fileno()).st_ino
+            self._log_offset += len(data)
+            if self._log_offset > _COMPACT_FACTOR * self.max_entries * _KEY_RECORD.size:
+                self._compact()
+
+    def _compact(self):
+        # Caller holds both locks; other processes notice the new inode and replay it
+        data = b"".join(_KEY_RECORD.pack(bytes.fromhex(key), row) for key, row in self._slots.items())
+        tmp_path = self._log_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            inode = os.fstat(f.fileno()).st_ino
+        os.replace(tmp_path, self._log_path)
+        self._log_inode = inode
+        self._log_offset = len(data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._slots),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+    def __len__(self):
+        return len(self._slots)
+
+
+class CachedEncoder:
+    """Drop-in wrapper around a SentenceTransformer: only cache misses reach the model."""
+
+    def __init__(self, model, model_name, cache=None, **cache_kwargs):
+        self.model = model
+        self.model_name = model_name
+        if cache is None:
+            cache = EmbeddingCache(
+                model_name, model.get_sentence_embedding_dimension(), **cache_kwargs
+            )
+        self.cache = cache
+
+    def get_sentence_embedding_dimension(self):
+        return self.cache.dim
+
+    def encode(self, sentences, normalize_embeddings=False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        keys = [text_key(self.model_name, t, normalize_embeddings) for t in texts]
+        out = np.empty((len(texts), self.cache.dim), dtype=np.float32)
+
+        # Dedupe misses so a repeated text is encoded once per call
+        missing = OrderedDict()
+        for i, (key, vec) in enumerate(zip(keys, self.cache.get_many(keys))):
+            if vec is None:
+                missing.setdefault(key, []).append(i)
+            else:
+                out[i] = vec
+
+        if missing:
+            miss_texts = [texts[rows[0]] for rows in missing.values()]
+            kwargs.pop("convert_to_tensor", None)
+            kwargs["convert_to_numpy"] = True
+            vectors = self.model.encode(
+                miss_texts, normalize_embeddings=normalize_embeddings, **kwargs
+            )
+            for rows, vec in zip(missing.values(), vectors):
+                out[rows] = vec
+            self.cache.put_many(zip(missing, vectors))
+
+        return out[0] if single else out
+
+    def stats(self):
+        return self.cache.stats()
+
+
+class ChromaEmbeddingFunction:
+    """Lets a Chroma collection embed `query_texts` / `documents` with any encoder here."""
+
+    def __init__(self, encoder):
+        self.encoder = encoder
+
+    def __call__(self, input):
+        return self.encoder.encode(list(input)).tolist()
+
+
+def load_cached_model(model_name="all-MiniLM-L6-v2", cache_dir=DEFAULT_CACHE_DIR,
+                      max_entries=100_000, backend=EMBEDDING_BACKEND):
+    """Cached encoder; backend is "torch" (SentenceTransformer) or "onnx-int8" / "onnx"."""
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(model_name)
+        cache_name = model_name
+    elif backend in ("onnx", "onnx-int8"):
+        from rag_utils.onnx_encoder import load_onnx_encoder
+
+        model = load_onnx_encoder(model_name, quantized=backend == "onnx-int8")
+        # Quantized outputs differ slightly, so they get their own cache rows
+        cache_name = f"{model_name}@{backend}"
+    else:
+        raise ValueError(f"Unknown embedding backend {backend!r}")
+    return CachedEncoder(model, cache_name, cache_dir=cache_dir, max_entries=max_entries)
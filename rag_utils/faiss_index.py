@@ -0,0 +1,154 @@
+import math
+import os
+import warnings
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq")
+
+
+def _nlist_for(n, nlist=None):
+    # Rule of thumb: ~sqrt(n) lists, never more lists than training points
+    if nlist is None:
+        nlist = int(4 * math.sqrt(n))
+    return max(1, min(nlist, n))
+
+
+def build_index(embeddings, index_type="flat", nlist=None, hnsw_m=32,
+                pq_m=16, pq_bits=8, ef_construction=200):
+    """Train (if needed) and fill a FAISS index from `model.encode` output."""
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    n, dim = embeddings.shape
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+    elif index_type == "ivf":
+        quantizer = faiss.IndexFlatL2(dim)
+        index = faiss.IndexIVFFlat(quantizer, dim, _nlist_for(n, nlist))
+    elif index_type == "ivfpq":
+        if dim % pq_m:
+            raise ValueError(f"pq_m={pq_m} must divide the embedding size {dim}")
+        # Each PQ codebook needs at least 2**bits training points
+        bits = max(1, min(pq_bits, int(math.log2(n)))) if n > 1 else 1
+        quantizer = faiss.IndexFlatL2(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, _nlist_for(n, nlist), pq_m, bits)
+    else:
+        raise ValueError(f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}")
+
+    if not index.is_trained:
+        index.train(embeddings)
+    index.add(embeddings)
+    return index
+
+
+def set_search_params(index, nprobe=None, ef_search=None):
+    if nprobe is not None:
+        try:
+            faiss.extract_index_ivf(index).nprobe = nprobe
+        except RuntimeError:
+            pass  # not an IVF index
+    if ef_search is not None and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+    return index
+
+
+def save_index(index, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    faiss.write_index(index, path)
+
+
+def load_index(path):
+    return faiss.read_index(path)
+
+
+def recall_at_k(index, exact_index, queries, k=10):
+    """Fraction of the exact top-k that `index` also returns, averaged over queries."""
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    k = min(k, exact_index.ntotal)
+    _, truth = exact_index.search(queries, k)
+    _, found = index.search(queries, k)
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return hits / (len(queries) * k)
+
+
+class MmapDocStore:
+    """Read-only document list backed by a memory-mapped UTF-8 blob and offsets array."""
+
+    def __init__(self, directory):
+        self._offsets = np.load(os.path.join(directory, "offsets.npy"), mmap_mode="r")
+        blob_path = os.path.join(directory, "docs.bin")
+        if os.path.getsize(blob_path):
+            self._blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+        else:
+            self._blob = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return bytes(self._blob[start:end]).decode("utf-8")
+
+
+def save_store(directory, index, documents):
+    """Persist an index plus its row -> document mapping for mmap-ed reopening."""
+    os.makedirs(directory, exist_ok=True)
+    encoded = [doc.encode("utf-8") for doc in documents]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+
+    with open(os.path.join(directory, "docs.bin"), "wb") as f:
+        for b in encoded:
+            f.write(b)
+    np.save(os.path.join(directory, "offsets.npy"), offsets)
+    faiss.write_index(index, os.path.join(directory, "index.faiss"))
+
+
+def index_type(index):
+    """The `INDEX_TYPES` name of a built or loaded index (the FAISS class name otherwise)."""
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    if isinstance(index, faiss.IndexFlat):
+        return "flat"
+    return type(index).__name__
+
+
+def open_store(directory, require_mmap=False):
+    """Open a saved store read-only, memory-mapping what this FAISS build can map.
+
+    The documents are always mapped. IO_FLAG_MMAP only maps IVF inverted
+    lists, so "ivf" / "ivfpq" keep their vectors on disk (the coarse
+    quantizer is small and read into RAM). "flat" and "hnsw" are mapped only
+    by FAISS builds that define IO_FLAG_MMAP_IFC; older ones read the whole
+    index into each process. That case warns, or raises ValueError with
+    require_mmap=True.
+    """
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    mmap_ifc = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+    if mmap_ifc is not None:
+        flags |= mmap_ifc
+    index = faiss.read_index(os.path.join(directory, "index.faiss"), flags)
+    kind = index_type(index)
+    if kind not in ("ivf", "ivfpq") and mmap_ifc is None:
+        message = (
+            f"{directory}: this FAISS build cannot memory-map a {kind!r} index "
+            f"(no IO_FLAG_MMAP_IFC), so all {index.ntotal} vectors were read into RAM"
+        )
+        if require_mmap:
+            raise ValueError(message + "; save an IVF index or upgrade FAISS")
+        warnings.warn(message, RuntimeWarning, stacklevel=2)
+    return index, MmapDocStore(directory)
+
+
+def store_exists(directory):
+    return os.path.exists(os.path.join(directory, "index.faiss"))
@@ -0,0 +1,212 @@
+import math
+import os
+import pickle
+import re
+import threading
+from collections import Counter
+
+from rag_utils.local_index import matches_filter
+from rag_utils.oplog import OpLog, pending_logs, replay
+
+# Keeps identifiers such as ERR_404, v1.2.3 or user-id together as one token
+_TOKEN = re.compile(r"[a-z0-9]+(?:[._\-][a-z0-9]+)*")
+
+
+# Snapshot tables are pickled in slices of this many entries: one pickle call
+# for the whole index would hold the GIL, and so stall searches, for its duration
+_SLICE = 10_000
+_TABLES = ("_postings", "_doc_terms", "_doc_len", "_ids", "_numbers", "_payloads")
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    """In-process inverted index with Okapi BM25 scoring.
+
+    Postings map term -> {doc number: term frequency}; external ids are kept
+    in a side table so postings stay small ints. Pass `payloads` to `add` to
+    keep e.g. chunk metadata for backends that cannot look it up by id.
+
+    `BM25Index.open(path)` makes it durable: every `add` / `remove` is
+    appended to `<path>.log` before returning, and `compact` folds the log
+    into the snapshot without blocking searches.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = {}
+        self._doc_terms = {}   # doc number -> unique terms (for removal)
+        self._doc_len = {}
+        self._ids = {}         # doc number -> external id
+        self._numbers = {}     # external id -> doc number
+        self._payloads = {}
+        self._next = 0
+        self._total_len = 0
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._log = None
+        self.path = None
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, ids, texts, payloads=None):
+        ids, texts = list(ids), list(texts)
+        payloads = list(payloads) if payloads is not None else None
+        with self._lock:
+            for i, (doc_id, text) in enumerate(zip(ids, texts)):
+                if doc_id in self._numbers:
+                    self._remove(doc_id)
+                tf = Counter(tokenize(text))
+                n = self._next
+                self._next += 1
+                for term, count in tf.items():
+                    self._postings.setdefault(term, {})[n] = count
+                self._doc_terms[n] = tuple(tf)
+                self._doc_len[n] = sum(tf.values())
+                self._total_len += self._doc_len[n]
+                self._ids[n] = doc_id
+                self._numbers[doc_id] = n
+                if payloads is not None:
+                    self._payloads[doc_id] = payloads[i]
+            if self._log:
+                self._log.append(("add", ids, texts, payloads))
+
+    def remove(self, ids):
+        ids = list(ids)
+        with self._lock:
+            for doc_id in ids:
+                if doc_id in self._numbers:
+                    self._remove(doc_id)
+            if self._log:
+                self._log.append(("remove", ids))
+
+    def _remove(self, doc_id):
+        n = self._numbers.pop(doc_id)
+        for term in self._doc_terms.pop(n):
+            postings = self._postings[term]
+            del postings[n]
+            if not postings:
+                del self._postings[term]
+        self._total_len -= self._doc_len.pop(n)
+        del self._ids[n]
+        self._payloads.pop(doc_id, None)
+
+    def payload(self, doc_id):
+        return self._payloads.get(doc_id)
+
+    def search(self, query, k=10, filter=None):
+        """Return [(id, score)] for the top-k documents, best first.
+
+        `filter` is matched against the payloads (same syntax as the vector stores).
+        """
+        with self._lock:
+            n_docs = len(self._ids)
+            if not n_docs:
+                return []
+            avgdl = self._total_len / n_docs
+            scores = Counter()
+            allowed = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for n, tf in postings.items():
+                    if filter:
+                        if n not in allowed:
+                            payload = self._payloads.get(self._ids[n]) or {}
+                            allowed[n] = matches_filter(payload, filter)
+                        if not allowed[n]:
+                            continue
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_len[n] / avgdl)
+                    scores[n] += idf * tf * (self.k1 + 1) / (tf + norm)
+            return [(self._ids[n], score) for n, score in scores.most_common(k)]
+
+    def save(self, path):
+        # Written aside and swapped in, so a crash never leaves a half-written snapshot
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._lock, open(tmp_path, "wb") as f:
+            tables = {name: list(getattr(self, name).items()) for name in _TABLES}
+            header = {"format": 2, "k1": self.k1, "b": self.b, "_next": self._next,
+                      "_total_len": self._total_len,
+                      "slices": {name: -(-len(items) // _SLICE) for name, items in tables.items()}}
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            for name in _TABLES:
+                items = tables[name]
+                for start in range(0, len(items), _SLICE):
+                    pickle.dump(items[start:start + _SLICE], f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        with open(path, "rb") as f:
+            header = pickle.load(f)
+            if header.get("format") != 2:
+                # Single-pickle snapshot from before slicing
+                index.__dict__.update(header)
+                return index
+            index.k1, index.b = header["k1"], header["b"]
+            index._next, index._total_len = header["_next"], header["_total_len"]
+            for name in _TABLES:
+                table = getattr(index, name)
+                for _ in range(header["slices"][name]):
+                    table.update(pickle.load(f))
+        return index
+
+    def _apply_log(self, log_path):
+        for record in replay(log_path):
+            if record[0] == "add":
+                self.add(*record[1:])
+            else:
+                self.remove(record[1])
+
+    @classmethod
+    def open(cls, path):
+        """Snapshot at `path` (if any) plus the operations logged since."""
+        log_path = path + ".log"
+        index = cls.load(path) if os.path.exists(path) else cls()
+        for pending in pending_logs(log_path):
+            index._apply_log(pending)
+        index._log = OpLog(log_path)
+        index.path = path
+        if os.path.exists(index._log.rotated_path):
+            # A compaction was interrupted: finish it from what was just replayed
+            index.save(path)
+            index._log.drop_rotated()
+        return index
+
+    def compact(self):
+        """Fold the log into the snapshot; only the log switch takes the index lock.
+
+        The new snapshot is rebuilt in a separate index from the previous
+        snapshot plus the rotated log, so searches and adds carry on meanwhile.
+        """
+        with self._compact_lock:
+            with self._lock:
+                rotated = self._log.rotate()
+            snapshot = BM25Index.load(self.path) if os.path.exists(self.path) else BM25Index(self.k1, self.b)
+            snapshot._apply_log(rotated)
+            snapshot.save(self.path)
+            self._log.drop_rotated()
+
+    def maybe_compact(self):
+        # Same trigger as LocalIndex.maybe_compact, measured against the pickled snapshot
+        snapshot_size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if self._log and self._log.size() > max(snapshot_size, 1 << 20):
+            self.compact()
+
+
+def reciprocal_rank_fusion(rankings, k=60, top_n=None):
+    """Merge ranked id lists: score(d) = sum over lists of 1 / (k + rank)."""
+    scores = Counter()
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return [doc_id for doc_id, _ in scores.most_common(top_n)]
@@ -0,0 +1,162 @@
+import queue
+import threading
+import time
+
+_DONE = object()
+
+
+def embed_in_batches(embedder, texts, batch_size=64):
+    # Encode longest-first so each batch holds similar lengths (less padding)
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+    embeddings = [None] * len(texts)
+    for start in range(0, len(order), batch_size):
+        batch_ids = order[start:start + batch_size]
+        vectors = embedder.encode([texts[i] for i in batch_ids], batch_size=batch_size)
+        for i, vec in zip(batch_ids, vectors):
+            embeddings[i] = vec.tolist() if hasattr(vec, "tolist") else list(vec)
+    return embeddings
+
+
+def chroma_writer(collection):
+    def write(ids, documents, embeddings, metadatas):
+        if not any(metadatas):
+            metadatas = None
+        collection.upsert(ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+    return write
+
+
+def _drain(q):
+    while q.get() is not _DONE:
+        pass
+
+
+def _put(q, item, stop):
+    # Blocks like q.put, but gives up once `stop` is set (the consumer may be gone)
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def run_pipeline(items, embedder, writer, batch_size=64, sort_window=4,
+                 write_batch_size=500, queue_size=8):
+    """Stream (id, text, metadata) items through embed and write stages.
+
+    Parsing/chunking (whatever produces `items`), embedding and writing run
+    concurrently, joined by bounded queues, so memory stays flat and
+    embedding starts as soon as the first page is parsed. `writer` is called
+    as writer(ids, documents, embeddings, metadatas). If any stage fails, the
+    others stop at their next item instead of finishing the job for nothing.
+    """
+    chunk_q = queue.Queue(maxsize=batch_size * queue_size)
+    write_q = queue.Queue(maxsize=queue_size)
+    errors = []
+    stop = threading.Event()
+
+    def fail(e):
+        errors.append(e)
+        stop.set()
+
+    def produce():
+        source = iter(items)
+        try:
+            for item in source:
+                if not _put(chunk_q, item, stop):
+                    break
+        except BaseException as e:
+            fail(e)
+        finally:
+            if stop.is_set() and hasattr(source, "close"):
+                source.close()  # let a generator clean up (temp files, pools) now
+            chunk_q.put(_DONE)  # the embed stage always drains up to it
+
+    def flush_window(window):
+        if stop.is_set():
+            return
+        embeddings = embed_in_batches(embedder, [text for _, text, _ in window], batch_size)
+        _put(write_q, (window, embeddings), stop)
+
+    def embed():
+        done = False
+        try:
+            window = []
+            while not stop.is_set():
+                item = chunk_q.get()
+                if item is _DONE:
+                    done = True
+                    break
+                window.append(item)
+                # Sort across several batches worth of chunks to cut padding
+                if len(window) >= batch_size * sort_window:
+                    flush_window(window)
+                    window = []
+            if window:
+                flush_window(window)
+        except BaseException as e:
+            fail(e)
+        finally:
+            if not done:
+                _drain(chunk_q)
+            write_q.put(_DONE)  # the write stage always drains up to it
+
+    threads = [
+        threading.Thread(target=produce, daemon=True),
+        threading.Thread(target=embed, daemon=True)
+    ]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+
+    count = 0
+    pending = ([], [], [], [])
+    try:
+        while True:
+            batch = write_q.get()
+            if batch is _DONE:
+                break
+            if stop.is_set():
+                continue  # an earlier stage failed: drain without writing
+            window, embeddings = batch
+            for (item_id, text, meta), emb in zip(window, embeddings):
+                pending[0].append(item_id)
+                pending[1].append(text)
+                pending[2].append(emb)
+                pending[3].append(meta)
+                if len(pending[0]) >= write_batch_size:
+                    writer(*pending)
+                    count += len(pending[0])
+                    pending = ([], [], [], [])
+        if pending[0] and not stop.is_set():
+            writer(*pending)
+            count += len(pending[0])
+    except BaseException:
+        stop.set()
+        _drain(write_q)
+        raise
+    finally:
+        for t in threads:
+            t.join()
+
+    if errors:
+        raise errors[0]
+
+    elapsed = time.perf_counter() - t0
+    return {
+        "chunks": count,
+        "seconds": elapsed,
+        "chunks_per_sec": count / elapsed if elapsed > 0 else float("inf")
+    }
+
+
+def ingest_chunks(collection, embedder, documents, ids, metadatas=None,
+                  batch_size=64, write_batch_size=2000):
+    """Embed an in-memory list of chunks and write them with a few bulk adds."""
+    metadatas = metadatas or [None] * len(documents)
+    return run_pipeline(
+        zip(ids, documents, metadatas), embedder, chroma_writer(collection),
+        batch_size=batch_size, sort_window=max(1, len(documents) // batch_size + 1),
+        write_batch_size=write_batch_size
+    )
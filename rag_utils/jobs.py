@@ -0,0 +1,252 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+DEFAULT_JOBS_DIR = os.getenv(
+    "INGEST_JOBS_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "rag_utils", "jobs")
+)
+
+
+class SpooledFile:
+    """An uploaded file saved to disk, with the attributes the parsers use."""
+
+    def __init__(self, path, name, type):
+        self.path = path
+        self.name = name
+        self.type = type
+
+    def getvalue(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+
+class JobQueue:
+    """Ingestion jobs persisted in SQLite, with their uploads spooled to disk.
+
+    Each job also keeps a checkpoint file of the chunk ids whose write has
+    been committed, so an interrupted job resumes after its last batch.
+    """
+
+    def __init__(self, root=DEFAULT_JOBS_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._db_path = os.path.join(root, "jobs.db")
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, status TEXT, created REAL, updated REAL,"
+                " files TEXT, total_files INTEGER, files_done INTEGER DEFAULT 0,"
+                " chunks INTEGER DEFAULT 0, result TEXT, error TEXT)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per call: the UI and worker threads share the file
+        db = sqlite3.connect(self._db_path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _job_dir(self, job_id):
+        return os.path.join(self.root, job_id)
+
+    def submit(self, files):
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = self._job_dir(job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        spooled = []
+        for n, file in enumerate(files):
+            path = os.path.join(job_dir, f"{n}.upload")
+            with open(path, "wb") as f:
+                f.write(file.getvalue())
+            spooled.append({"path": path, "name": file.name, "type": file.type})
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, status, created, updated, files, total_files)"
+                " VALUES (?, 'queued', ?, ?, ?, ?)",
+                (job_id, now, now, json.dumps(spooled), len(spooled))
+            )
+        return job_id
+
+    def claim(self):
+        """Mark the oldest queued job as running and return it (or None)."""
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE jobs SET status = 'running', updated = ? WHERE id = ?",
+                       (time.time(), row[0]))
+        return self.get(row[0])
+
+    def requeue_interrupted(self):
+        # Jobs left "running" by a previous process get picked up again
+        with self._connect() as db:
+            return db.execute(
+                "UPDATE jobs SET status = 'queued', updated = ? WHERE status = 'running'",
+                (time.time(),)
+            ).rowcount
+
+    def retry(self, job_id):
+        """Queue a failed job again; it resumes from its checkpoint."""
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET status = 'queued', error = NULL, updated = ?"
+                       " WHERE id = ? AND status = 'failed'", (time.time(), job_id))
+
+    def update(self, job_id, **fields):
+        fields["updated"] = time.time()
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"])
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as db:
+            db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def _row(self, cursor, row):
+        job = {col[0]: value for col, value in zip(cursor.description, row)}
+        job["files"] = json.loads(job["files"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def get(self, job_id):
+        with self._connect() as db:
+            cursor = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+            return self._row(cursor, row) if row else None
+
+    def recent(self, limit=5):
+        with self._connect() as db:
+            cursor = db.execute("SELECT * FROM jobs ORDER BY created DESC LIMIT ?", (limit,))
+            return [self._row(cursor, row) for row in cursor.fetchall()]
+
+    def files(self, job):
+        return [SpooledFile(f["path"], f["name"], f["type"]) for f in job["files"]]
+
+    def committed_ids(self, job_id):
+        path = os.path.join(self._job_dir(job_id), "committed.ids")
+        if not os.path.exists(path):
+            return set()
+        with open(path, "r", encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+
+    def commit(self, job_id, ids):
+        with open(os.path.join(self._job_dir(job_id), "committed.ids"), "a", encoding="utf-8") as f:
+            f.write("".join(f"{i}\n" for i in ids))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def cleanup(self, job_id):
+        shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+
+
+class JobContext:
+    """What a job handler sees: its files, resume state and progress hooks."""
+
+    def __init__(self, queue, job):
+        self.queue = queue
+        self.job_id = job["id"]
+        self.files = queue.files(job)
+        self.committed = queue.committed_ids(self.job_id)
+        self.chunks = len(self.committed)
+        self.files_done = 0
+        self.resumed = bool(self.committed)
+        # Last item id of each file whose items have all been handed out, oldest first
+        self._pending_files = deque()
+        self._files_lock = threading.Lock()
+
+    def skip_committed(self, items):
+        """Drop (id, text, meta) items already written by an earlier run of this job."""
+        for item in items:
+            if item[0] not in self.committed:
+                yield item
+
+    def track_files(self, files):
+        """Flatten (file, items) pairs into one item stream, minus committed items.
+
+        A file counts as done once its last item has been committed, not when
+        it has been parsed, so progress never runs ahead of the writes.
+        """
+        for _, items in files:
+            last = None
+            for item in self.skip_committed(items):
+                last = item[0]
+                yield item
+            self._pending_files.append(last)
+            self._advance_files()
+
+    def _advance_files(self):
+        # Called from the producer and the writer thread
+        with self._files_lock:
+            done = 0
+            while self._pending_files and (
+                self._pending_files[0] is None or self._pending_files[0] in self.committed
+            ):
+                self._pending_files.popleft()
+                done += 1
+            if done:
+                self.files_done += done
+                self.queue.update(self.job_id, files_done=self.files_done)
+
+    def commit(self, ids):
+        """Record a successful write; call it after the batch is durable."""
+        self.queue.commit(self.job_id, ids)
+        self.committed.update(ids)
+        self.chunks += len(ids)
+        self.queue.update(self.job_id, chunks=self.chunks)
+        self._advance_files()
+
+
+class JobWorker:
+    """Background thread that runs queued jobs one at a time with `handler(ctx)`.
+
+    It lives outside the Streamlit rerun cycle (create it in a
+    `st.cache_resource` loader); the UI only submits jobs and polls the queue.
+    """
+
+    def __init__(self, queue, handler, poll_interval=1.0):
+        self.queue = queue
+        self.handler = handler
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        queue.requeue_interrupted()
+        self._thread = threading.Thread(target=self._run, name="ingest-jobs", daemon=True)
+        self._thread.start()
+
+    def submit(self, files):
+        job_id = self.queue.submit(files)
+        self._wake.set()
+        return job_id
+
+    def _run(self):
+        while not self._stop.is_set():
+            job = self.queue.claim()
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            ctx = JobContext(self.queue, job)
+            try:
+                result = self.handler(ctx)
+            except Exception:
+                self.queue.update(job["id"], status="failed", error=traceback.format_exc(limit=3))
+            else:
+                self.queue.update(job["id"], status="done", result=result)
+                self.queue.cleanup(job["id"])
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
@@ -0,0 +1,354 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from rag_utils.oplog import OpLog, pending_logs, replay
+
+
+# Metadata fields with a secondary (field, value) -> rows index
+INDEXED_FIELDS = ("source",)
+
+
+def matches_filter(metadata, filter):
+    # Supports the Pinecone subset the apps use: {"field": value},
+    # {"field": {"$eq": value}} and {"field": {"$in": [values]}}
+    for field, cond in filter.items():
+        value = metadata.get(field)
+        if isinstance(cond, dict):
+            if "$eq" in cond and value != cond["$eq"]:
+                return False
+            if "$in" in cond and value not in cond["$in"]:
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+def _allowed_values(cond):
+    # Set of values a condition accepts
+    if not isinstance(cond, dict):
+        return {cond}
+    allowed = None
+    if "$eq" in cond:
+        allowed = {cond["$eq"]}
+    if "$in" in cond:
+        allowed = set(cond["$in"]) if allowed is None else allowed & set(cond["$in"])
+    return allowed if allowed is not None else set()
+
+
+class LocalIndex:
+    """In-process stand-in for a Pinecone index (`upsert` / `query` / `delete`).
+
+    Vectors live in a cosine-normalised float32 matrix that grows by doubling;
+    queries are one matrix multiply per batch. `latency_ms` adds a fixed delay
+    per call so request batching can be benchmarked offline.
+
+    Rows are keyed by (namespace, id) as in Pinecone, so the same id in two
+    namespaces is two records, and `indexed_fields` keep a (field, value) -> rows index, so a namespace or a
+    filter on those fields narrows the rows before any vector is scored.
+
+    `LocalIndex.open(directory)` makes it durable: writes are appended to an
+    fsynced log before returning and `compact` folds the log into the saved
+    snapshot without holding the lock for the rewrite.
+    """
+
+    def __init__(self, dimension=384, latency_ms=0.0, indexed_fields=INDEXED_FIELDS):
+        self.dimension = dimension
+        self.latency = latency_ms / 1000.0
+        self.indexed_fields = tuple(indexed_fields)
+        self._matrix = np.zeros((0, dimension), dtype=np.float32)
+        self._size = 0
+        self._ids = []
+        self._rows = {}  # (namespace, id) -> row
+        self._metadata = []
+        self._namespaces = []
+        self._partitions = {}
+        self._postings = {}
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._log = None
+        self.directory = None
+        self.requests = 0
+        # namespace -> rows scored vs rows in the namespace, summed over queries
+        self.scan_stats = {}
+
+    def __len__(self):
+        return self._size
+
+    def _wait(self):
+        # Request threads call this concurrently; `+=` is not atomic
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _index_row(self, row):
+        self._partitions.setdefault(self._namespaces[row], set()).add(row)
+        for field in self.indexed_fields:
+            value = self._metadata[row].get(field)
+            if isinstance(value, (str, int, float, bool)):
+                self._postings.setdefault((field, value), set()).add(row)
+
+    def _unindex_row(self, row):
+        self._partitions.get(self._namespaces[row], set()).discard(row)
+        for field in self.indexed_fields:
+            value = self._metadata[row].get(field)
+            if isinstance(value, (str, int, float, bool)):
+                self._postings.get((field, value), set()).discard(row)
+
+    def _reindex(self):
+        self._rows = {key: row for row, key in enumerate(zip(self._namespaces, self._ids))}
+        self._partitions = {}
+        self._postings = {}
+        for row in range(self._size):
+            self._index_row(row)
+
+    def _candidate_rows(self, namespace, filter):
+        # Indexed fields are resolved from the postings; anything else is
+        # checked row by row, but only on rows that survived the postings
+        rows = self._partitions.get(namespace or "", set())
+        residual = {}
+        for field, cond in (filter or {}).items():
+            if field in self.indexed_fields:
+                matched = set()
+                for value in _allowed_values(cond):
+                    matched |= self._postings.get((field, value), set())
+                rows = rows & matched
+            else:
+                residual[field] = cond
+        if residual:
+            rows = [r for r in rows if matches_filter(self._metadata[r], residual)]
+        return np.array(sorted(rows), dtype=np.int64)
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        if needed <= len(self._matrix):
+            return
+        grown = np.zeros((max(needed, 2 * len(self._matrix), 64), self.dimension), dtype=np.float32)
+        grown[:self._size] = self._matrix[:self._size]
+        self._matrix = grown
+
+    def upsert(self, vectors, namespace=None):
+        self._wait()
+        if not vectors:
+            return {"upserted_count": 0}
+        ids, values, metas = [], [], []
+        for v in vectors:
+            if isinstance(v, dict):
+                ids.append(v["id"])
+                values.append(v["values"])
+                metas.append(v.get("metadata") or {})
+            else:
+                ids.append(v[0])
+                values.append(v[1])
+                metas.append(v[2] if len(v) > 2 else {})
+        namespace = namespace or ""
+
+        new = np.asarray(values, dtype=np.float32).reshape(len(ids), self.dimension)
+        new /= np.maximum(np.linalg.norm(new, axis=1, keepdims=True), 1e-12)
+
+        with self._lock:
+            self._reserve(len(ids))
+            for i, item_id in enumerate(ids):
+                row = self._rows.get((namespace, item_id))
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                    self._rows[(namespace, item_id)] = row
+                    self._ids.append(item_id)
+                    self._metadata.append(metas[i])
+                    self._namespaces.append(namespace)
+                else:
+                    self._unindex_row(row)
+                    self._metadata[row] = metas[i]
+                self._index_row(row)
+                self._matrix[row] = new[i]
+            if self._log:
+                self._log.append(("upsert", ids, new, metas, namespace))
+        return {"upserted_count": len(ids)}
+
+    def delete(self, ids, namespace=None):
+        self._wait()
+        ids = list(ids)
+        namespace = namespace or ""
+        with self._lock:
+            drop = {self._rows[(namespace, i)] for i in ids if (namespace, i) in self._rows}
+            if not drop:
+                return {}
+            if self._log:
+                self._log.append(("delete", ids, namespace))
+            keep = [row for row in range(self._size) if row not in drop]
+            self._matrix = self._matrix[keep]
+            self._size = len(keep)
+            self._ids = [self._ids[row] for row in keep]
+            self._metadata = [self._metadata[row] for row in keep]
+            self._namespaces = [self._namespaces[row] for row in keep]
+            self._reindex()
+        return {}
+
+    def query_batch(self, vectors, top_k=10, include_metadata=False, filter=None, namespace=None):
+        """Top-k for several query vectors with a single matrix multiply."""
+        q = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        q = q / np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-12)
+        with self._lock:
+            namespace = namespace or ""
+            partition_size = len(self._partitions.get(namespace, ()))
+            whole = not filter and partition_size == self._size
+            rows = np.arange(self._size) if whole else self._candidate_rows(namespace, filter)
+
+            stats = self.scan_stats.setdefault(namespace, {"queries": 0, "scanned": 0, "total": 0})
+            stats["queries"] += len(q)
+            stats["scanned"] += len(rows) * len(q)
+            stats["total"] += partition_size * len(q)
+            if not len(rows):
+                return [[] for _ in range(len(q))]
+            candidates = self._matrix[:self._size] if whole else self._matrix[rows]
+            scores = q @ candidates.T
+            k = min(top_k, len(rows))
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+            results = []
+            for qi in range(len(q)):
+                order = top[qi][np.argsort(-scores[qi, top[qi]])]
+                matches = []
+                for c in order:
+                    row = int(rows[c])
+                    match = {"id": self._ids[row], "score": float(scores[qi, c])}
+                    if include_metadata:
+                        match["metadata"] = self._metadata[row]
+                    matches.append(match)
+                results.append(matches)
+        return results
+
+    def query(self, vector, top_k=10, include_metadata=False, namespace=None, filter=None):
+        self._wait()
+        return {"matches": self.query_batch([vector], top_k, include_metadata, filter, namespace)[0]}
+
+    def describe_index_stats(self):
+        with self._lock:
+            return {
+                "dimension": self.dimension,
+                "total_vector_count": self._size,
+                "namespaces": {ns: {"vector_count": len(rows)}
+                               for ns, rows in self._partitions.items() if rows}
+            }
+
+    def partition_stats(self, field="source"):
+        """Per-namespace row counts by `field` value, and the share of rows filters skipped."""
+        with self._lock:
+            out = {}
+            for ns, rows in self._partitions.items():
+                if not rows:
+                    continue
+                counts = {value: len(rows & members)
+                          for (f, value), members in self._postings.items() if f == field}
+                scan = self.scan_stats.get(ns, {"queries": 0, "scanned": 0, "total": 0})
+                out[ns] = {
+                    "vector_count": len(rows),
+                    field: {value: n for value, n in counts.items() if n},
+                    "queries": scan["queries"],
+                    "rows_scanned": scan["scanned"],
+                    "scan_avoided": 1 - scan["scanned"] / scan["total"] if scan["total"] else 0.0
+                }
+            return out
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        items_path = os.path.join(directory, "items.json")
+        # Each save writes a new vectors file that items.json names; swapping
+        # items.json in is the single commit point, so the pair always matches
+        vectors_name = f"vectors.{time.time_ns()}.npy"
+        with self._lock:
+            with open(os.path.join(directory, vectors_name), "wb") as f:
+                np.save(f, self._matrix[:self._size])
+                f.flush()
+                os.fsync(f.fileno())
+            with open(items_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"ids": self._ids, "metadata": self._metadata,
+                           "namespaces": self._namespaces, "vectors": vectors_name}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(items_path + ".tmp", items_path)
+        # Older matrices are unlinked; one still mapped stays readable until unmapped
+        for name in os.listdir(directory):
+            if name.startswith("vectors") and name.endswith(".npy") and name != vectors_name:
+                os.remove(os.path.join(directory, name))
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Reopen a saved index; with mmap=True the matrix is mapped copy-on-write."""
+        with open(os.path.join(directory, "items.json"), "r", encoding="utf-8") as f:
+            items = json.load(f)
+        vectors_path = os.path.join(directory, items.get("vectors", "vectors.npy"))
+        try:
+            matrix = np.load(vectors_path, mmap_mode="c" if mmap else None)
+        except ValueError:
+            matrix = np.load(vectors_path)  # an empty matrix cannot be mapped
+        index = cls(dimension=matrix.shape[1])
+        index._matrix = matrix
+        index._size = len(items["ids"])
+        index._ids = items["ids"]
+        index._metadata = items["metadata"]
+        index._namespaces = items.get("namespaces") or [""] * index._size
+        index._reindex()
+        return index
+
+    def _apply_log(self, log_path):
+        for record in replay(log_path):
+            if record[0] == "upsert":
+                _, ids, values, metas, namespace = record
+                self.upsert(list(zip(ids, values, metas)), namespace=namespace)
+            elif len(record) > 2:
+                self.delete(record[1], namespace=record[2])
+            else:
+                # Logged before deletes were scoped to a namespace: drop the ids everywhere
+                for namespace in set(self._namespaces):
+                    self.delete(record[1], namespace=namespace)
+
+    @classmethod
+    def open(cls, directory, dimension=384):
+        """Saved snapshot in `directory` (if any) plus the writes logged since."""
+        log_path = os.path.join(directory, "ops.log")
+        if os.path.exists(os.path.join(directory, "items.json")):
+            index = cls.load(directory)
+        else:
+            index = cls(dimension)
+        for pending in pending_logs(log_path):
+            index._apply_log(pending)
+        index._log = OpLog(log_path)
+        index.directory = directory
+        if os.path.exists(index._log.rotated_path):
+            # A compaction was interrupted: finish it from what was just replayed
+            index.save(directory)
+            index._log.drop_rotated()
+        return index
+
+    def compact(self):
+        """Fold the log into the snapshot; only the log switch takes the index lock.
+
+        The new snapshot is built in a separate index from the previous
+        snapshot plus the rotated log, so queries and upserts carry on meanwhile.
+        """
+        with self._compact_lock:
+            with self._lock:
+                rotated = self._log.rotate()
+            if os.path.exists(os.path.join(self.directory, "items.json")):
+                snapshot = LocalIndex.load(self.directory)
+            else:
+                snapshot = LocalIndex(self.dimension, indexed_fields=self.indexed_fields)
+            snapshot._apply_log(rotated)
+            snapshot.save(self.directory)
+            self._log.drop_rotated()
+
+    def maybe_compact(self):
+        # Compact once the log is bigger than the snapshot (items.json plus the vectors it
+        # would write) and past 1 MiB. Each rewrite is then paid for by at least as many
+        # bytes of logged writes, so rewrite work stays linear in what was written.
+        items_path = os.path.join(self.directory, "items.json")
+        snapshot_size = os.path.getsize(items_path) if os.path.exists(items_path) else 0
+        snapshot_size += self.dimension * 4 * self._size
+        if self._log and self._log.size() > max(snapshot_size, 1 << 20):
+            self.compact()
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+
+# Vector stores cap ids per delete request (Pinecone: 1000)
+DELETE_BATCH_SIZE = 1000
+
+
+def chunk_id(source, text, namespace=""):
+    # Deterministic: the same chunk of the same source always maps to the same id.
+    # Tenants get their own ids; the default namespace keeps the ids it always had
+    scope = f"{namespace}\0{source}" if namespace else source
+    source_hash = hashlib.sha256(scope.encode("utf-8")).hexdigest()[:16]
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+    return f"{source_hash}-{text_hash}"
+
+
+class JsonManifest:
+    """Per-source set of indexed chunk ids, stored as a JSON file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._sources = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._sources = {k: set(v) for k, v in json.load(f).items()}
+
+    def get(self, source):
+        return set(self._sources.get(source, ()))
+
+    def sources(self):
+        return sorted(self._sources)
+
+    def set(self, source, ids):
+        if ids:
+            self._sources[source] = set(ids)
+        else:
+            self._sources.pop(source, None)
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({k: sorted(v) for k, v in self._sources.items()}, f)
+        os.replace(tmp_path, self.path)
+
+
+class ChromaManifest:
+    """Reads the indexed ids straight from a Chroma collection's `source` metadata."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def get(self, source):
+        return set(self.collection.get(where={"source": source}, include=[])["ids"])
+
+    def set(self, source, ids):
+        pass  # the collection itself is the record
+
+    def save(self):
+        pass
+
+
+class IncrementalIndexer:
+    """Skip chunks that are already indexed and remove the ones that disappeared.
+
+    Wrap each source's chunks with `new_chunks`, run them through the ingest
+    pipeline, then call `finish(delete)` once the writes have succeeded.
+    """
+
+    def __init__(self, manifest, namespace=""):
+        self.manifest = manifest
+        self.namespace = namespace
+        self._seen = {}
+        self.new = 0
+        self.skipped = 0
+        self.removed = 0
+
+    def new_chunks(self, source, chunks):
+        indexed = self.manifest.get(source)
+        seen = self._seen.setdefault(source, set())
+        for chunk in chunks:
+            cid = chunk_id(source, chunk, self.namespace)
+            if cid in seen:
+                self.skipped += 1  # duplicate chunk inside the same source
+                continue
+            seen.add(cid)
+            if cid in indexed:
+                self.skipped += 1
+                continue
+            self.new += 1
+            yield cid, chunk
+
+    def finish(self, delete):
+        for source, seen in self._seen.items():
+            stale = sorted(self.manifest.get(source) - seen)
+            for start in range(0, len(stale), DELETE_BATCH_SIZE):
+                delete(stale[start:start + DELETE_BATCH_SIZE])
+            self.removed += len(stale)
+            self.manifest.set(source, seen)
+        self.manifest.save()
+        self._seen = {}
+        return self.stats()
+
+    def stats(self):
+        return {"new": self.new, "skipped": self.skipped, "removed": self.removed}
@@ -0,0 +1,115 @@
+import os
+
+import numpy as np
+
+DEFAULT_ONNX_DIR = os.getenv(
+    "ONNX_MODEL_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "rag_utils", "onnx")
+)
+
+
+def _hub_name(model_name):
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+
+def export_onnx(model_name, out_dir, opset=14):
+    """Export the transformer body of a SentenceTransformer to ONNX (fp32)."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(_hub_name(model_name))
+    model = AutoModel.from_pretrained(_hub_name(model_name))
+    model.eval()
+    tokenizer.save_pretrained(out_dir)
+
+    dummy = tokenizer(["export"], return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic = {name: {0: "batch", 1: "seq"} for name in names}
+    dynamic["last_hidden_state"] = {0: "batch", 1: "seq"}
+    path = os.path.join(out_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(dummy[name] for name in names), path,
+            input_names=names, output_names=["last_hidden_state"],
+            dynamic_axes=dynamic, opset_version=opset
+        )
+    return path
+
+
+def quantize(fp32_path, int8_path):
+    """int8 dynamic quantization of the MatMul/Gemm weights (activations stay fp32)."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+
+class OnnxEncoder:
+    """MiniLM under ONNX Runtime with the SentenceTransformer `encode` interface.
+
+    Mean pooling + L2 normalisation reproduce all-MiniLM-L6-v2's pipeline.
+    """
+
+    def __init__(self, model_dir, quantized=True, max_length=256, threads=None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_length = max_length
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        filename = "model-int8.onnx" if quantized else "model.onnx"
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, filename), options, providers=["CPUExecutionProvider"]
+        )
+        self._inputs = {i.name for i in self.session.get_inputs()}
+        self._dim = self.session.get_outputs()[0].shape[-1]
+
+    def get_sentence_embedding_dimension(self):
+        return self._dim if isinstance(self._dim, int) else 384
+
+    def _encode_batch(self, texts):
+        enc = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+        )
+        feeds = {k: v.astype(np.int64) for k, v in enc.items() if k in self._inputs}
+        hidden = self.session.run(None, feeds)[0]
+        mask = enc["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    def encode(self, sentences, batch_size=32, normalize_embeddings=False, **kwargs):
+        # Output is always normalised, matching all-MiniLM-L6-v2's Normalize layer
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        out = np.empty((len(texts), self.get_sentence_embedding_dimension()), dtype=np.float32)
+        # Length-sorted batches keep padding small
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            out[rows] = self._encode_batch([texts[i] for i in rows])
+        return out[0] if single else out
+
+
+def load_onnx_encoder(model_name="all-MiniLM-L6-v2", onnx_dir=DEFAULT_ONNX_DIR, quantized=True):
+    """Export (and quantize) on first use, then load from `onnx_dir`."""
+    model_dir = os.path.join(onnx_dir, model_name.replace("/", "__"))
+    fp32_path = os.path.join(model_dir, "model.onnx")
+    int8_path = os.path.join(model_dir, "model-int8.onnx")
+    if not os.path.exists(fp32_path):
+        export_onnx(model_name, model_dir)
+    if quantized and not os.path.exists(int8_path):
+        quantize(fp32_path, int8_path)
+    return OnnxEncoder(model_dir, quantized=quantized)
+
+
+def cosine_drift(candidate, reference, sentences):
+    """Per-sentence cosine similarity between two encoders' outputs."""
+    a = np.asarray(candidate.encode(sentences), dtype=np.float32)
+    b = np.asarray(reference.encode(sentences), dtype=np.float32)
+    a /= np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b /= np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    sims = (a * b).sum(axis=1)
+    return {"mean": float(sims.mean()), "min": float(sims.min()), "p5": float(np.percentile(sims, 5))}
@@ -0,0 +1,87 @@
+import os
+import pickle
+import struct
+
+_HEADER = struct.Struct("<Q")
+
+
+class OpLog:
+    """Append-only log of pickled operations kept next to an index snapshot.
+
+    Each `append` is length-prefixed and fsynced, so once it returns the
+    operation survives a crash; a torn record at the tail is ignored on
+    replay. `rotate` moves the live log aside so a snapshot can be written
+    from the old snapshot + rotated log without touching the live index.
+    Operations must be idempotent per id (upsert / delete), because a crash
+    between writing the snapshot and dropping the rotated log replays it again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.rotated_path = path + ".old"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if os.path.exists(path):
+            # Cut a torn tail off, or records appended after it would never replay
+            valid = _valid_length(path)
+            if valid < os.path.getsize(path):
+                os.truncate(path, valid)
+        self._file = open(path, "ab")
+
+    def append(self, record):
+        data = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        self._file.write(_HEADER.pack(len(data)) + data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def size(self):
+        return self._file.tell()
+
+    def rotate(self):
+        """Move the live log to `rotated_path` and start a new one (caller holds the index lock)."""
+        if os.path.exists(self.rotated_path):
+            raise RuntimeError(f"{self.rotated_path} is still pending; finish the last compaction first")
+        self._file.close()
+        os.replace(self.path, self.rotated_path)
+        self._file = open(self.path, "ab")
+        return self.rotated_path
+
+    def drop_rotated(self):
+        if os.path.exists(self.rotated_path):
+            os.remove(self.rotated_path)
+
+    def close(self):
+        self._file.close()
+
+
+def _records(path):
+    # (end offset, payload bytes) of every complete record
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            (length,) = _HEADER.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                return
+            yield f.tell(), data
+
+
+def _valid_length(path):
+    end = 0
+    for end, _ in _records(path):
+        pass
+    return end
+
+
+def replay(path):
+    """Records from a log file, oldest first; stops at a torn tail."""
+    if not os.path.exists(path):
+        return
+    for _, data in _records(path):
+        yield pickle.loads(data)
+
+
+def pending_logs(path):
+    """Log files to replay over the snapshot: a rotated one left by a crash, then the live one."""
+    return [p for p in (path + ".old", path) if os.path.exists(p)]
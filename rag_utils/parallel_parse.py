@@ -0,0 +1,143 @@
+import functools
+import io
+import itertools
+import os
+import shutil
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from pypdf import PdfReader
+
+from rag_utils.readers import iter_docx_paragraphs
+
+# Large PDFs are split into page ranges of this size, one task each
+PAGES_PER_TASK = 16
+
+
+def make_pool(max_workers=None):
+    return ProcessPoolExecutor(max_workers=max_workers or os.cpu_count())
+
+
+# Worker-side functions: return (list of text pieces, start time, end time). PDFs are read
+# from a spooled copy on disk, so a page range only ships a path to the worker
+
+@functools.lru_cache(maxsize=2)
+def _open_pdf(path, mtime_ns, size):
+    # A worker usually gets several ranges of one file in a row: parse it once
+    return PdfReader(path)
+
+
+def _parse_pdf_range(path, start, end):
+    t0 = time.perf_counter()
+    info = os.stat(path)
+    reader = _open_pdf(path, info.st_mtime_ns, info.st_size)
+    pieces = []
+    for i in range(start, end):
+        text = reader.pages[i].extract_text()
+        if text:
+            pieces.append(text)
+    return pieces, t0, time.perf_counter()
+
+
+def _parse_docx(data):
+    t0 = time.perf_counter()
+    pieces = list(iter_docx_paragraphs(io.BytesIO(data)))
+    return pieces, t0, time.perf_counter()
+
+
+def _parse_nothing():
+    t0 = time.perf_counter()
+    return [], t0, t0
+
+
+def _parse_txt(data):
+    t0 = time.perf_counter()
+    return [data.decode("utf-8")], t0, time.perf_counter()
+
+
+def _file_bytes(file):
+    return file.getvalue() if hasattr(file, "getvalue") else file.read()
+
+
+def _spool(data, spool_dir):
+    fd, path = tempfile.mkstemp(suffix=".pdf", dir=spool_dir)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return path
+
+
+def _tasks(files, pages_per_task, spool_dir):
+    # (file_no, fn, args, spooled path or None, last task of the file?)
+    for file_no, file in enumerate(files):
+        data = _file_bytes(file)
+        if file.type == "application/pdf":
+            n_pages = len(PdfReader(io.BytesIO(data)).pages)
+            if n_pages == 0:
+                yield file_no, _parse_nothing, (), None, True
+                continue
+            path = _spool(data, spool_dir)
+            for start in range(0, n_pages, pages_per_task):
+                end = min(start + pages_per_task, n_pages)
+                yield file_no, _parse_pdf_range, (path, start, end), path, end == n_pages
+        elif file.type == "text/plain":
+            yield file_no, _parse_txt, (data,), None, True
+        else:
+            yield file_no, _parse_docx, (data,), None, True
+
+
+def _timing_key(timings, name):
+    # Two uploads can share a name; keep both entries
+    key, n = name, 1
+    while key in timings:
+        n += 1
+        key = f"{name} ({n})"
+    return key
+
+
+def _iter_results(files, executor, pages_per_task, timings, spool_dir):
+    in_flight = deque()
+    max_in_flight = 2 * getattr(executor, "_max_workers", os.cpu_count() or 1)
+    spans = {}
+
+    def pop():
+        file_no, future, path, last = in_flight.popleft()
+        pieces, started, finished = future.result()
+        first, _ = spans.get(file_no, (started, finished))
+        spans[file_no] = (min(first, started), finished)
+        if last:
+            # Wall time from the first range starting to the last one finishing
+            first, finished = spans.pop(file_no)
+            timings[_timing_key(timings, files[file_no].name)] = finished - first
+            if path:
+                os.remove(path)
+        return file_no, pieces
+
+    # Bounded window of outstanding tasks; results come back in submission order
+    for file_no, fn, args, path, last in _tasks(files, pages_per_task, spool_dir):
+        in_flight.append((file_no, executor.submit(fn, *args), path, last))
+        if len(in_flight) >= max_in_flight:
+            yield pop()
+    while in_flight:
+        yield pop()
+
+
+def parse_files(files, executor, pages_per_task=PAGES_PER_TASK, timings=None):
+    """Parse uploaded files across a process pool, streaming results back in order.
+
+    Yields (file, pieces) per file, where pieces iterates the file's text pages
+    or paragraphs. Each PDF is written to a temporary file once and its page
+    ranges are parsed from there. Per-file wall-clock parse seconds are
+    recorded in `timings` when given, keyed by file name ("name (2)" for a
+    repeated name).
+    """
+    files = list(files)
+    timings = {} if timings is None else timings
+    spool_dir = tempfile.mkdtemp(prefix="rag_parse_")
+    try:
+        results = _iter_results(files, executor, pages_per_task, timings, spool_dir)
+        for file_no, group in itertools.groupby(results, key=lambda r: r[0]):
+            yield files[file_no], (piece for _, pieces in group for piece in pieces)
+    finally:
+        shutil.rmtree(spool_dir, ignore_errors=True)
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire `ttl` seconds after insertion."""
+
+    def __init__(self, maxsize=1024, ttl=600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+
+def normalize_query(query):
+    # MiniLM is uncased and whitespace-insensitive, so these all embed the same
+    return " ".join(query.lower().split())
+
+
+def _vector_key(vector):
+    return hashlib.sha1(struct.pack(f"{len(vector)}f", *vector)).hexdigest()
+
+
+class QueryCache:
+    """Caches query vectors and (vector, top_k, filter) -> matches for a chat RAG app.
+
+    Call `invalidate()` whenever the index is written to; cached vectors stay
+    valid (the embedder did not change), cached matches are dropped.
+    """
+
+    def __init__(self, maxsize=1024, ttl=600):
+        self.vectors = TTLCache(maxsize, ttl)
+        self.results = TTLCache(maxsize, ttl)
+        self.invalidations = 0
+
+    def embed(self, query, encode):
+        key = normalize_query(query)
+        vector = self.vectors.get(key)
+        if vector is None:
+            vector = encode(key)
+            self.vectors.put(key, vector)
+        return vector
+
+    def search(self, vector, top_k, search, filter=None):
+        key = (_vector_key(vector), top_k, json.dumps(filter, sort_keys=True))
+        matches = self.results.get(key)
+        if matches is None:
+            generation = self.invalidations
+            matches = search()
+            # Don't store results computed against an index that changed meanwhile
+            if generation == self.invalidations:
+                self.results.put(key, matches)
+        return matches
+
+    def invalidate(self):
+        self.results.clear()
+        self.invalidations += 1
+
+    def stats(self):
+        return {
+            "vectors": self.vectors.stats(),
+            "results": self.results.stats(),
+            "invalidations": self.invalidations
+        }
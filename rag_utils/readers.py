@@ -0,0 +1,47 @@
+import io
+
+from pypdf import PdfReader
+
+TXT_BLOCK_SIZE = 64 * 1024
+
+# Bump whenever text extraction changes; cached document text is keyed on it
+PARSER_VERSION = 1
+
+
+def iter_pdf_pages(file):
+    # One page in memory at a time; extract_text() is called once per page
+    reader = PdfReader(file)
+    for page in reader.pages:
+        text = page.extract_text()
+        if text:
+            yield text
+
+
+def iter_docx_paragraphs(file):
+    # python-docx is only needed for .docx uploads (the Colab notebook never installs it)
+    from docx import Document
+
+    doc = Document(file)
+    for p in doc.paragraphs:
+        yield p.text
+
+
+def iter_txt_blocks(file, block_size=TXT_BLOCK_SIZE):
+    reader = io.TextIOWrapper(file, encoding="utf-8")
+    try:
+        while True:
+            block = reader.read(block_size)
+            if not block:
+                break
+            yield block
+    finally:
+        # Don't let the wrapper close the uploaded file object
+        reader.detach()
+
+
+def iter_file_text(file):
+    if file.type == "application/pdf":
+        return iter_pdf_pages(file)
+    if file.type == "text/plain":
+        return iter_txt_blocks(file)
+    return iter_docx_paragraphs(file)
@@ -0,0 +1,60 @@
+import hashlib
+import math
+import os
+
+from rag_utils.query_cache import TTLCache, normalize_query
+
+DEFAULT_RERANKER = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Sigmoid of the cross-encoder logit; passages below this never reach the generator
+DEFAULT_CUTOFF = float(os.getenv("RERANK_CUTOFF", "0.3"))
+
+
+def _pair_key(query, passage):
+    h = hashlib.sha1(query.encode("utf-8"))
+    h.update(b"\0")
+    h.update(passage.encode("utf-8"))
+    return h.hexdigest()
+
+
+class Reranker:
+    """Second retrieval stage: score (query, passage) pairs with a cross-encoder.
+
+    All uncached pairs of a query go through one batched forward pass; scores
+    are cached per (query, passage) since they depend on nothing else.
+    """
+
+    def __init__(self, model=None, model_name=DEFAULT_RERANKER, cutoff=DEFAULT_CUTOFF,
+                 cache_size=4096, batch_size=32):
+        if model is None:
+            from sentence_transformers import CrossEncoder
+
+            model = CrossEncoder(model_name, max_length=512)
+        self.model = model
+        self.cutoff = cutoff
+        self.batch_size = batch_size
+        self.cache = TTLCache(maxsize=cache_size, ttl=float("inf"))
+
+    def score(self, query, passages):
+        query = normalize_query(query)
+        keys = [_pair_key(query, p) for p in passages]
+        scores = [self.cache.get(key) for key in keys]
+        missing = [i for i, s in enumerate(scores) if s is None]
+        if missing:
+            logits = self.model.predict(
+                [(query, passages[i]) for i in missing], batch_size=self.batch_size
+            )
+            for i, logit in zip(missing, logits):
+                scores[i] = 1.0 / (1.0 + math.exp(-float(logit)))
+                self.cache.put(keys[i], scores[i])
+        return scores
+
+    def rerank(self, query, passages, top_k=3, cutoff=None):
+        """[(position in `passages`, score)] above the cutoff, best first, at most top_k."""
+        if not passages:
+            return []
+        cutoff = self.cutoff if cutoff is None else cutoff
+        scored = sorted(enumerate(self.score(query, passages)), key=lambda x: x[1], reverse=True)
+        return [(i, s) for i, s in scored if s >= cutoff][:top_k]
+
+    def stats(self):
+        return self.cache.stats()
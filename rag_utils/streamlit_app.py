@@ -0,0 +1,92 @@
+import os
+
+import streamlit as st
+
+from rag_utils.doc_cache import DocumentCache, parse_chunks
+from rag_utils.embedding_cache import load_cached_model
+from rag_utils.hybrid import BM25Index
+from rag_utils.parallel_parse import make_pool
+from rag_utils.query_cache import QueryCache
+from rag_utils.rerank import Reranker
+
+# Shared resources of the Streamlit RAG apps, created once per server process
+
+@st.cache_resource
+def load_embedder():
+    # EMBEDDING_BACKEND=onnx-int8 swaps in the quantized ONNX Runtime encoder
+    return load_cached_model("all-MiniLM-L6-v2")
+
+
+@st.cache_resource
+def load_parse_pool():
+    return make_pool()
+
+
+# Extracted text + chunk offsets by file hash, shared across sessions and restarts
+@st.cache_resource
+def load_doc_cache():
+    return DocumentCache()
+
+
+# Lexical index kept next to the vector one (both persist across restarts)
+@st.cache_resource
+def load_bm25(path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return BM25Index.open(path)
+
+
+# Shared by all sessions; invalidated by every write to the index
+@st.cache_resource
+def load_query_cache():
+    return QueryCache(maxsize=1024, ttl=600)
+
+
+# Cross-encoder second stage; scores cached per (query, chunk)
+@st.cache_resource
+def load_reranker():
+    return Reranker()
+
+
+def iter_file_chunk_items(files, indexer, parse_times, include_text=False):
+    """(file, items) per file, items being the (id, chunk, metadata) not indexed yet.
+
+    Files seen before (by content hash) come from the document cache; the
+    rest are parsed in worker processes (page ranges for big PDFs) and
+    stream back in order. Chunks already indexed are skipped before
+    embedding; their ids hash the chunk text, so chunks are sliced here
+    rather than at embed time. Feed the result to `JobContext.track_files`.
+    """
+    chunked = parse_chunks(files, load_parse_pool(), load_doc_cache(), timings=parse_times)
+    for file, chunks in chunked:
+        yield file, _items(file, indexer.new_chunks(file.name, chunks), include_text)
+
+
+def _items(file, new_chunks, include_text):
+    for chunk_id, chunk in new_chunks:
+        metadata = {"text": chunk, "source": file.name} if include_text else {"source": file.name}
+        yield chunk_id, chunk, metadata
+
+
+# Job progress, polled every 2 seconds without rerunning the whole page
+@st.fragment(run_every=2)
+def show_jobs(queue):
+    for job in queue.recent(3):
+        names = ", ".join(f["name"] for f in job["files"])
+        st.caption(f"**{job['status'].capitalize()}**: {names}")
+        if job["status"] in ("queued", "running"):
+            st.progress(
+                job["files_done"] / max(job["total_files"], 1),
+                text=f"{job['files_done']}/{job['total_files']} files, {job['chunks']} chunks written"
+            )
+        elif job["status"] == "done":
+            result = job["result"]
+            st.caption(
+                f"{result['new']} new, {result['skipped']} unchanged, {result['removed']} removed "
+                f"chunks at {result['chunks_per_sec']:.1f} chunks/sec"
+            )
+            for name, seconds in result["parse_times"].items():
+                st.caption(f"Parsed {name} in {seconds:.2f}s")
+        elif job["status"] == "failed":
+            st.caption(job["error"].strip().splitlines()[-1])
+            if st.button("Retry", key=f"retry-{job['id']}"):
+                queue.retry(job["id"])
@@ -0,0 +1,101 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Pinecone accepts up to 1000 vectors and 2 MB per upsert, but recommends batches of
+# about 100 vectors; we send 100 and let many requests run at once instead
+MAX_BATCH_COUNT = 100
+MAX_BATCH_BYTES = 2 * 1024 * 1024
+
+
+def estimate_bytes(vector):
+    # Rough JSON request size: ~12 bytes per float, plus id and metadata
+    item_id, values, metadata = vector
+    return 32 + len(item_id) + 12 * len(values) + len(json.dumps(metadata or {}))
+
+
+def split_batches(vectors, max_count=MAX_BATCH_COUNT, max_bytes=MAX_BATCH_BYTES):
+    batch, size = [], 0
+    for vector in vectors:
+        nbytes = estimate_bytes(vector)
+        if batch and (len(batch) >= max_count or size + nbytes > max_bytes):
+            yield batch
+            batch, size = [], 0
+        batch.append(vector)
+        size += nbytes
+    if batch:
+        yield batch
+
+
+class ConcurrentUpserter:
+    """Size-aware, concurrent `index.upsert` with per-batch retries.
+
+    Vectors are (id, values, metadata) tuples. At most `max_in_flight`
+    requests run at once; a failed batch is retried on its own with
+    exponential backoff, so one bad request does not resend the others.
+    """
+
+    def __init__(self, index, max_in_flight=4, max_count=MAX_BATCH_COUNT,
+                 max_bytes=MAX_BATCH_BYTES, retries=3, backoff=0.5):
+        self.index = index
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.retries = retries
+        self.backoff = backoff
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self.batches = 0
+        self.retried = 0
+        self._count_lock = threading.Lock()  # counters are updated from the pool threads
+
+    def _send(self, batch, namespace):
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    self.index.upsert(vectors=batch, namespace=namespace)
+                    return len(batch)
+                except Exception:
+                    if attempt == self.retries:
+                        raise
+                    with self._count_lock:
+                        self.retried += 1
+                    time.sleep(self.backoff * (2 ** attempt))
+        finally:
+            self._slots.release()
+
+    def upsert(self, vectors, namespace=None):
+        t0 = time.perf_counter()
+        futures = []
+        for batch in split_batches(vectors, self.max_count, self.max_bytes):
+            # Blocks once max_in_flight batches are outstanding
+            self._slots.acquire()
+            futures.append(self._executor.submit(self._send, batch, namespace))
+            with self._count_lock:
+                self.batches += 1
+
+        sent, errors = 0, []
+        for future in futures:
+            try:
+                sent += future.result()
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            raise RuntimeError(f"{len(errors)} upsert batch(es) failed after retries") from errors[0]
+
+        elapsed = time.perf_counter() - t0
+        return {
+            "vectors": sent,
+            "batches": len(futures),
+            "seconds": elapsed,
+            "vectors_per_sec": sent / elapsed if elapsed > 0 else float("inf")
+        }
+
+    def writer(self, namespace=None):
+        """A writer(ids, documents, embeddings, metadatas) for `run_pipeline`, into `namespace`."""
+        def write(ids, documents, embeddings, metadatas):
+            return self.upsert(list(zip(ids, embeddings, metadatas)), namespace=namespace)
+        return write
+
+    def close(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,101 @@
+
+from rag_utils.local_index import LocalIndex
+from rag_utils.upsert import ConcurrentUpserter
+
+BACKENDS = ("pinecone", "local")
+
+
+class VectorStore:
+    """What the RAG apps need from a vector index.
+
+    Matches are dicts with "id", "score" and "metadata". `namespace` selects a
+    tenant partition; `filter` narrows candidates before vector scoring.
+    """
+
+    def upsert(self, ids, embeddings, metadatas, namespace=None):
+        raise NotImplementedError
+
+    def delete(self, ids, namespace=None):
+        raise NotImplementedError
+
+    def query(self, vector, top_k=3, filter=None, namespace=None):
+        raise NotImplementedError
+
+    def query_batch(self, vectors, top_k=3, filter=None, namespace=None):
+        return [self.query(vector, top_k, filter, namespace) for vector in vectors]
+
+    def partition_stats(self):
+        return {}
+
+    def save(self):
+        pass
+
+
+class PineconeStore(VectorStore):
+    def __init__(self, index, max_in_flight=4):
+        self.index = index
+        self.upserter = ConcurrentUpserter(index, max_in_flight=max_in_flight)
+
+    def upsert(self, ids, embeddings, metadatas, namespace=None):
+        # Split by count and payload size, sent with a few requests in flight
+        return self.upserter.upsert(list(zip(ids, embeddings, metadatas)), namespace=namespace)
+
+    def delete(self, ids, namespace=None):
+        self.index.delete(ids=ids, namespace=namespace)
+
+    def query(self, vector, top_k=3, filter=None, namespace=None):
+        # Pinecone applies the metadata filter inside the index search
+        result = self.index.query(vector=vector, top_k=top_k, include_metadata=True,
+                                  filter=filter, namespace=namespace)
+        return [
+            {"id": m["id"], "score": m["score"], "metadata": m["metadata"]}
+            for m in result["matches"]
+        ]
+
+    def partition_stats(self):
+        namespaces = self.index.describe_index_stats()["namespaces"]
+        return {ns: {"vector_count": info["vector_count"]} for ns, info in namespaces.items()}
+
+
+class LocalStore(VectorStore):
+    """Embedded backend: normalised float32 matrix + metadata, no network round trip.
+
+    With `path` set, every write is logged there before it returns and the
+    snapshot is reopened memory-mapped; `save` compacts the log when it has
+    outgrown the snapshot.
+    """
+
+    def __init__(self, dimension=384, path=None):
+        self.path = path
+        if path:
+            self.index = LocalIndex.open(path, dimension)
+        else:
+            self.index = LocalIndex(dimension)
+
+    def upsert(self, ids, embeddings, metadatas, namespace=None):
+        self.index.upsert(vectors=list(zip(ids, embeddings, metadatas)), namespace=namespace)
+
+    def delete(self, ids, namespace=None):
+        self.index.delete(ids, namespace=namespace)
+
+    def query(self, vector, top_k=3, filter=None, namespace=None):
+        return self.query_batch([vector], top_k, filter, namespace)[0]
+
+    def query_batch(self, vectors, top_k=3, filter=None, namespace=None):
+        return self.index.query_batch(vectors, top_k, include_metadata=True,
+                                      filter=filter, namespace=namespace)
+
+    def partition_stats(self):
+        return self.index.partition_stats()
+
+    def save(self):
+        if self.path:
+            self.index.maybe_compact()
+
+
+def make_store(backend, **kwargs):
+    if backend == "local":
+        return LocalStore(kwargs.get("dimension", 384), kwargs.get("path"))
+    if backend == "pinecone":
+        return PineconeStore(kwargs["index"], kwargs.get("max_in_flight", 4))
+    raise ValueError(f"Unknown vector backend {backend!r}, expected one of {BACKENDS}")